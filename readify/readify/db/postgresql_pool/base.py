@@ -0,0 +1,41 @@
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+from .creation import DatabaseCreation
+from .pool import get_connection_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that takes its connections from a pool of the process instead of opening them,
+    and gives them back to the pool instead of closing them.
+
+    With CONN_MAX_AGE = 0 Django "closes" the connection at the end of every request,
+    so the connection is kept only for the duration of a request, by the WSGI thread
+    or the thread of an async view, and the number of connections of a process is bounded by the pool.
+    The pool is configured with the POOL dictionary of the database settings:
+    MAX_SIZE, MAX_LIFETIME, CHECK_INTERVAL and TIMEOUT, see ConnectionPool.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        self.pool = get_connection_pool(self.alias, conn_params, self.settings_dict.get('POOL', {}))
+        connection = self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # set by get_new_connection() of the parent only for a new connection
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django keeps the connection until the atomic block exits, so it can't be reused
+                self.pool.discard(self.connection)
+            else:
+                self.pool.release(self.connection)
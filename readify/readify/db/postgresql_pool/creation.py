@@ -0,0 +1,15 @@
+from django.db.backends.postgresql import creation
+
+from .pool import close_connection_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """The pooled connections to a test database are closed before it is cloned or dropped."""
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_connection_pools()
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_connection_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
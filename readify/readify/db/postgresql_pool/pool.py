@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+from collections import deque
+from time import monotonic
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 10
+# seconds
+DEFAULT_MAX_LIFETIME = 1800
+DEFAULT_CHECK_INTERVAL = 30
+DEFAULT_TIMEOUT = 10
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection of the pool became free in time, Django raises it as an OperationalError."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of at most max_size connections to a database, kept by the current process.
+
+    A connection taken from the pool is checked with "SELECT 1" when it has been idle
+    for more than check_interval seconds, and a connection older than max_lifetime seconds is closed
+    instead of being reused. A connection given back in a transaction is rolled back,
+    and a broken one is closed. The session state set outside of transactions is kept,
+    as with persistent connections of Django.
+    When all the connections are in use, the next caller waits up to timeout seconds for one.
+    """
+
+    def __init__(self, name, max_size=DEFAULT_MAX_SIZE, max_lifetime=DEFAULT_MAX_LIFETIME,
+                 check_interval=DEFAULT_CHECK_INTERVAL, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        # (connection, time it was given back), the most recently used last
+        self._idle = deque()
+        # creation time of every open connection
+        self._created = {}
+        # number of connections being opened, their places are reserved
+        self._opening = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+        self.failed_checks = 0
+
+    def acquire(self, connect):
+        """Returns an idle connection of the pool, or a new one made by connect() while the pool isn't full."""
+        deadline = monotonic() + self.timeout
+        while True:
+            connection, idle_since = self._take(deadline)
+            if connection is None:
+                return self._open(connect)
+            if monotonic() - idle_since > self.check_interval and not self._check(connection):
+                continue
+            return connection
+
+    def release(self, connection):
+        """Gives a connection back to the pool, it is rolled back or closed if it can't be reused as it is."""
+        if os.getpid() != self.pid:
+            # the connection is shared with the parent process, which still owns it
+            return
+
+        reusable = not connection.closed and not self._is_expired(connection)
+        if reusable and connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            if connection.info.transaction_status == TRANSACTION_STATUS_UNKNOWN:
+                reusable = False
+            else:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    reusable = False
+
+        if not reusable:
+            self.discard(connection)
+            return
+
+        with self._condition:
+            self._idle.append((connection, monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Closes a connection taken from the pool and frees its place."""
+        with self._condition:
+            self._created.pop(connection, None)
+            self.closed += 1
+            self._condition.notify()
+        self._close(connection)
+
+    def close_idle(self):
+        """Closes the idle connections, the connections in use stay open."""
+        with self._condition:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            for connection in idle:
+                self._created.pop(connection, None)
+            self.closed += len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'connections': len(self._created) + self._opening,
+                'idle': len(self._idle),
+                'in_use': len(self._created) + self._opening - len(self._idle),
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'opened': self.opened,
+                'closed': self.closed,
+                'failed_checks': self.failed_checks,
+            }
+
+    def _take(self, deadline):
+        """Returns an idle connection with the time it became idle, or (None, None) if a new one can be opened."""
+        with self._condition:
+            waited = False
+            while True:
+                while self._idle:
+                    # the most recently used connection is the least likely to be broken
+                    connection, idle_since = self._idle.pop()
+                    if connection.closed or self._is_expired(connection):
+                        self._created.pop(connection, None)
+                        self.closed += 1
+                        self._close(connection)
+                        continue
+                    self.checkouts += 1
+                    return connection, idle_since
+
+                if len(self._created) + self._opening < self.max_size:
+                    self._opening += 1
+                    self.checkouts += 1
+                    return None, None
+
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'All {self.max_size} connections of the pool {self.name} are in use '
+                        f'for more than {self.timeout} seconds.'
+                    )
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._condition.wait(remaining)
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._opening -= 1
+            self._created[connection] = monotonic()
+            self.opened += 1
+        return connection
+
+    def _check(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            logger.warning('Closing a broken connection of the pool %s', self.name)
+            with self._condition:
+                self.failed_checks += 1
+            self.discard(connection)
+            return False
+        return True
+
+    def _is_expired(self, connection):
+        created = self._created.get(connection)
+        return created is not None and monotonic() - created > self.max_lifetime
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+
+# pools of the current process by the alias and the connection parameters of their database
+connection_pools = {}
+connection_pools_lock = threading.Lock()
+
+
+def get_connection_pool(alias, conn_params, options):
+    """
+    Returns the pool of the connections with the parameters, creating it on first use.
+    The pools inherited from the parent process are replaced, as their connections can't be shared.
+    """
+    key = (alias, tuple(sorted((name, repr(value)) for name, value in conn_params.items())))
+    with connection_pools_lock:
+        pool = connection_pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            database = conn_params.get('database') or conn_params.get('dbname') or alias
+            pool = connection_pools[key] = ConnectionPool(
+                name=f'{alias}:{database}',
+                max_size=options.get('MAX_SIZE', DEFAULT_MAX_SIZE),
+                max_lifetime=options.get('MAX_LIFETIME', DEFAULT_MAX_LIFETIME),
+                check_interval=options.get('CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL),
+                timeout=options.get('TIMEOUT', DEFAULT_TIMEOUT),
+            )
+        return pool
+
+
+def close_connection_pools():
+    """Closes the idle connections of every pool, e.g. before a database is dropped."""
+    with connection_pools_lock:
+        pools = list(connection_pools.values())
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.close_idle()
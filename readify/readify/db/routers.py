@@ -0,0 +1,146 @@
+import asyncio
+import random
+from contextvars import ContextVar
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import Resolver404, resolve
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# the modules of the views whose safe requests are served from the replicas
+REPLICA_VIEW_MODULES = ('store.api.views', 'store.api.async_views')
+
+# the database the current request reads from, None reads from the primary
+read_database = ContextVar('read_database', default=None)
+
+# the users who have written recently are kept in the shared cache under this prefix and their id
+PINNED_USER_KEY_PREFIX = 'read-your-writes:user:'
+
+
+class ReplicaRouter:
+    """
+    This router sends the reads of a request to the replica chosen for it by ReplicaMiddleware,
+    and every write, even of an object read from a replica, to the primary.
+    Only the primary is migrated, the replicas receive its changes by replication.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def get_token_user_id(request):
+    """
+    Returns the user id of the valid access token of the request, or None.
+    The token is only verified, so no query is made before the database of the request is chosen.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+
+    try:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return authentication.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+    except AuthenticationFailed:
+        return None
+
+
+def get_read_database(request):
+    """
+    A safe request to the views of REPLICA_VIEW_MODULES reads from a random replica,
+    unless the client has written recently: it carries the read-your-writes cookie,
+    or its access token belongs to a user pinned to the primary by pin_to_primary().
+    """
+    if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+        return None
+    if settings.READ_YOUR_WRITES_COOKIE in request.COOKIES:
+        return None
+
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return None
+    view = getattr(match.func, 'view_class', match.func)
+    if view.__module__ not in REPLICA_VIEW_MODULES:
+        return None
+
+    user_id = get_token_user_id(request)
+    if user_id is not None and cache.get(f'{PINNED_USER_KEY_PREFIX}{user_id}'):
+        return None
+
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def pin_to_primary(request, response):
+    """
+    After a successful write the client reads from the primary for READ_YOUR_WRITES_SECONDS,
+    so it sees its own changes before they reach the replicas.
+    Browsers are pinned with a cookie, and API clients, which usually ignore cookies,
+    by the user id of their access token in the shared cache, so all their devices are pinned too.
+    """
+    if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS and response.status_code < 400:
+        response.set_cookie(
+            settings.READ_YOUR_WRITES_COOKIE, '1',
+            max_age=settings.READ_YOUR_WRITES_SECONDS, httponly=True, samesite='Lax',
+        )
+        user_id = get_token_user_id(request)
+        if user_id is not None:
+            cache.set(f'{PINNED_USER_KEY_PREFIX}{user_id}', True, timeout=settings.READ_YOUR_WRITES_SECONDS)
+
+
+class ReplicaMiddleware:
+    """
+    This middleware chooses the database the request reads from before the view is called,
+    see get_read_database(), and pins the client to the primary after a write, see pin_to_primary().
+    The choice is kept in a context variable, so it also applies to the database threads of the async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # marks the instance as a coroutine function for the handler, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        token = read_database.set(get_read_database(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        pin_to_primary(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = read_database.set(get_read_database(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        pin_to_primary(request, response)
+        return response
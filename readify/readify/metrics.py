@@ -0,0 +1,347 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from hmac import compare_digest
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_safe
+
+from readify.db.postgresql_pool.pool import connection_pools, connection_pools_lock
+from store.cache import tagged_caches
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the histogram buckets in seconds and in queries
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_STATS_LINES = 40
+PROFILES_KEPT = 20
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus format, the last bucket is +Inf."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        count = 0
+        for bound, bucket_count in zip((*self.buckets, '+Inf'), self.counts):
+            count += bucket_count
+            yield f'{name}_bucket', {**labels, 'le': str(bound)}, count
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, count
+
+
+class RequestMetrics:
+    """
+    This class keeps the metrics of the requests served by the current process in memory:
+    the number of responses by status, latency and query count histograms, and the time spent in the database,
+    labelled with the route of the view instead of the path, so the number of series stays bounded.
+    Every process keeps its own metrics, as Prometheus scrapes and sums the processes itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = defaultdict(int)
+        self.durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.database_time = defaultdict(float)
+        self.profiled = 0
+        self.profiles = deque(maxlen=PROFILES_KEPT)
+
+    def observe(self, view, method, status, duration, query_count, database_time):
+        with self._lock:
+            self.responses[view, method, status] += 1
+            self.durations[view, method].observe(duration)
+            self.queries[view, method].observe(query_count)
+            self.database_time[view, method] += database_time
+
+    def add_profile(self, profile):
+        with self._lock:
+            self.profiled += 1
+            self.profiles.append(profile)
+
+    def recent_profiles(self):
+        with self._lock:
+            return list(self.profiles)
+
+    def samples(self):
+        """Yields the name, type, help text and samples of every metric."""
+        with self._lock:
+            responses = dict(self.responses)
+            durations = {key: list(histogram.samples(
+                'readify_http_request_duration_seconds', {'view': key[0], 'method': key[1]},
+            )) for key, histogram in self.durations.items()}
+            queries = {key: list(histogram.samples(
+                'readify_db_queries_per_request', {'view': key[0], 'method': key[1]},
+            )) for key, histogram in self.queries.items()}
+            database_time = dict(self.database_time)
+            profiled = self.profiled
+
+        yield 'readify_http_responses_total', 'counter', 'Number of responses by view, method and status.', [
+            ('readify_http_responses_total', {'view': view, 'method': method, 'status': str(status)}, count)
+            for (view, method, status), count in responses.items()
+        ]
+        yield 'readify_http_request_duration_seconds', 'histogram', 'Time to the first byte of the response.', [
+            sample for histogram_samples in durations.values() for sample in histogram_samples
+        ]
+        yield 'readify_db_queries_per_request', 'histogram', 'Number of database queries per request.', [
+            sample for histogram_samples in queries.values() for sample in histogram_samples
+        ]
+        yield 'readify_db_query_duration_seconds_total', 'counter', 'Time spent in database queries.', [
+            ('readify_db_query_duration_seconds_total', {'view': view, 'method': method}, seconds)
+            for (view, method), seconds in database_time.items()
+        ]
+        yield 'readify_profiled_requests_total', 'counter', 'Number of requests profiled with cProfile.', [
+            ('readify_profiled_requests_total', {}, profiled),
+        ]
+
+        caches = sorted((cache.name, cache.stats()) for cache in list(tagged_caches))
+        for stat, metric_type, help_text in (
+            ('hits', 'counter', 'Number of cache hits.'),
+            ('misses', 'counter', 'Number of cache misses.'),
+            ('evictions', 'counter', 'Number of least recently used entries evicted.'),
+            ('entries', 'gauge', 'Number of entries in the cache.'),
+            ('max_entries', 'gauge', 'Maximum number of entries in the cache.'),
+        ):
+            name = f'readify_cache_{stat}' + ('_total' if metric_type == 'counter' else '')
+            yield name, metric_type, help_text, [(name, {'cache': cache}, stats[stat]) for cache, stats in caches]
+
+        with connection_pools_lock:
+            pools = sorted((pool.name, pool.stats()) for pool in connection_pools.values())
+        for stat, metric_type, help_text in (
+            ('connections', 'gauge', 'Number of open connections of the pool.'),
+            ('idle', 'gauge', 'Number of idle connections of the pool.'),
+            ('in_use', 'gauge', 'Number of connections of the pool in use.'),
+            ('max_size', 'gauge', 'Maximum number of connections of the pool.'),
+            ('checkouts', 'counter', 'Number of connections taken from the pool.'),
+            ('waits', 'counter', 'Number of times a free connection of the pool was waited for.'),
+            ('timeouts', 'counter', 'Number of times no connection of the pool became free in time.'),
+            ('opened', 'counter', 'Number of connections opened by the pool.'),
+            ('closed', 'counter', 'Number of connections closed by the pool.'),
+            ('failed_checks', 'counter', 'Number of connections of the pool that failed the health check.'),
+        ):
+            name = f'readify_db_pool_{stat}' + ('_total' if metric_type == 'counter' else '')
+            yield name, metric_type, help_text, [(name, {'pool': pool}, stats[stat]) for pool, stats in pools]
+
+
+request_metrics = RequestMetrics()
+# cProfile can't profile two requests of the same process at once
+profile_lock = threading.Lock()
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics(metrics):
+    lines = []
+    for name, metric_type, help_text, samples in metrics.samples():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for sample_name, labels, value in samples:
+            label_text = ','.join(f'{label}="{escape_label(text)}"' for label, text in labels.items())
+            lines.append(f'{sample_name}{{{label_text}}} {value}' if label_text else f'{sample_name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def is_token_valid(value):
+    return bool(settings.METRICS_TOKEN) and compare_digest(value.encode(), settings.METRICS_TOKEN.encode())
+
+
+def should_profile(request):
+    """
+    A request is profiled when it carries the metrics token in the X-Profile header,
+    or randomly with the probability of METRICS_PROFILE_RATE.
+    """
+    header = request.META.get(PROFILE_HEADER)
+    if header is not None:
+        return is_token_valid(header)
+    return settings.METRICS_PROFILE_RATE > 0 and random.random() < settings.METRICS_PROFILE_RATE
+
+
+class RequestStats:
+    """The number of database queries of a request and the time spent in them, from any thread."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.database_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self._lock:
+            self.query_count += 1
+            self.database_time += duration
+
+
+# the statistics of the current request, copied into the threads that run its queries
+request_stats = ContextVar('request_stats', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = request_stats.get()
+        if stats is not None:
+            stats.add_query(perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """
+    Counts the queries of every connection into the statistics of the current request, see request_stats.
+    The connections are kept per thread, so the queries are counted on whichever thread runs the view:
+    the request thread, the thread of a sync view under ASGI or the database threads of the async views.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class MetricsMiddleware:
+    """
+    This middleware measures the latency of every request, the number of its database queries
+    and the time spent in them with an execute wrapper, without storing anything in the database.
+    The streamed part of a streaming response isn't measured.
+    Sampled requests are also profiled with cProfile, the statistics of the last ones are kept in memory
+    and logged, see METRICS_PROFILE_RATE.
+    Under ASGI the middleware runs asynchronously and the queries are counted by the threads that run them,
+    see install_query_counter(), but those requests aren't profiled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # marks the instance as a coroutine function for the handler, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        profiler = None
+        if should_profile(request) and profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+
+        started = perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            request_stats.reset(token)
+            if profiler is not None:
+                profile_lock.release()
+        duration = perf_counter() - started
+
+        view = self.observe(request, response, duration, stats)
+        if profiler is not None:
+            self.save_profile(profiler, request, view, duration, stats.query_count)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = request_stats.set(stats)
+
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        duration = perf_counter() - started
+
+        self.observe(request, response, duration, stats)
+        return response
+
+    @staticmethod
+    def observe(request, response, duration, stats):
+        match = request.resolver_match
+        view = match.route if match is not None else 'unmatched'
+        request_metrics.observe(
+            view, request.method, response.status_code, duration, stats.query_count, stats.database_time,
+        )
+        return view
+
+    @staticmethod
+    def save_profile(profiler, request, view, duration, query_count):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_STATS_LINES)
+        profile = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'view': view,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'duration': duration,
+            'queries': query_count,
+            'stats': output.getvalue(),
+        }
+        request_metrics.add_profile(profile)
+        logger.info(
+            'Profiled %s %s in %.1f ms with %d queries\n%s',
+            request.method, profile['path'], duration * 1000, query_count, profile['stats'],
+        )
+
+
+def is_metrics_request_allowed(request):
+    """The metrics are available with the metrics token as a bearer token, or to staff users."""
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if authorization.startswith('Bearer ') and is_token_valid(authorization[len('Bearer '):]):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@require_safe
+def metrics_view(request):
+    """This view exposes the request and cache metrics of the current process in the Prometheus text format."""
+    if not is_metrics_request_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(request_metrics), content_type=CONTENT_TYPE)
+
+
+@require_safe
+def profiles_view(request):
+    """This view shows the statistics of the last profiled requests of the current process, the newest first."""
+    if not is_metrics_request_allowed(request):
+        return HttpResponseForbidden()
+
+    profiles = request_metrics.recent_profiles()
+    text = '\n'.join(
+        f'{profile["created"]} {profile["method"]} {profile["path"]} ({profile["view"]}) '
+        f'{profile["duration"] * 1000:.1f} ms, {profile["queries"]} queries\n{profile["stats"]}'
+        for profile in reversed(profiles)
+    )
+    return HttpResponse(text, content_type='text/plain; charset=utf-8')
@@ -18,18 +18,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'django_filters',
     'djoser',
     'rest_framework',
     'rest_framework_simplejwt',
-    'silk',
 
     'users',
     'store',
 ]
 
 MIDDLEWARE = [
+    'readify.metrics.MetricsMiddleware',
+    'readify.db.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,10 +39,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-
-    'silk.middleware.SilkyMiddleware',
 ]
 
+# django-silk stores every request and query in the database, so it's enabled only for debugging
+SILK_ENABLED = os.environ.get('SILK_ENABLED') == 'true'
+if SILK_ENABLED:
+    INSTALLED_APPS.append('silk')
+    MIDDLEWARE.append('silk.middleware.SilkyMiddleware')
+
 ROOT_URLCONF = 'readify.urls'
 
 TEMPLATES = [
@@ -61,14 +67,54 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'readify.wsgi.application'
 
+# connections are taken from a pool of at most DATABASE_POOL_SIZE connections per process
+# and given back at the end of every request, 0 opens a new connection for every request
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 10)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'readify.db.postgresql_pool' if DATABASE_POOL_SIZE else 'django.db.backends.postgresql',
         'NAME': os.environ['POSTGRES_DB'],
         'USER': os.environ['POSTGRES_USER'],
         'PASSWORD': os.environ['POSTGRES_PASSWORD'],
-        'HOST': 'database',
-        'PORT': 5432,
+        'HOST': os.environ.get('POSTGRES_HOST') or 'database',
+        'PORT': int(os.environ.get('POSTGRES_PORT') or 5432),
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': DATABASE_POOL_SIZE,
+            # seconds a connection is reused for
+            'MAX_LIFETIME': int(os.environ.get('DATABASE_POOL_MAX_LIFETIME') or 1800),
+            # seconds a connection can be idle before it is checked with a query
+            'CHECK_INTERVAL': int(os.environ.get('DATABASE_POOL_CHECK_INTERVAL') or 30),
+            # seconds to wait for a free connection when all of them are in use
+            'TIMEOUT': int(os.environ.get('DATABASE_POOL_TIMEOUT') or 10),
+        },
+    }
+}
+
+# replicas of the primary as comma-separated host[:port[:database]], the catalogue is read from them
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, (os.environ.get('POSTGRES_REPLICAS') or '').split(',')), start=1):
+    replica_host, _, replica_address = replica.strip().partition(':')
+    replica_port, _, replica_name = replica_address.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': int(replica_port or DATABASES['default']['PORT']),
+        'NAME': replica_name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['readify.db.routers.ReplicaRouter']
+# a client reads from the primary for this number of seconds after a write, so it sees its changes
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS') or 10)
+READ_YOUR_WRITES_COOKIE = 'readify_primary'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -102,13 +148,38 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# media files are served by Django, see store.views.serve_media, only with DEBUG unless SERVE_MEDIA says otherwise;
+# in production the web server or the CDN serves MEDIA_ROOT at MEDIA_URL with the same headers, e.g. with nginx:
+#   location /media/ { root <BASE_DIR>; etag on; add_header Cache-Control "public, no-cache"; }
+#   location ~ ^/media/.*/[0-9a-f]{2}/[0-9a-f]{64}(\.[0-9a-z]+)?$ {
+#       root <BASE_DIR>; add_header Cache-Control "public, max-age=31536000, immutable";
+#   }
+# the second location matches the files stored under their content hash by ContentHashStorage, which never change
+SERVE_MEDIA = os.environ.get('SERVE_MEDIA', str(DEBUG).lower()) == 'true'
+
+# number of worker threads that generate thumbnails and WebP copies of uploaded images
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS') or 2)
+
+# bearer token of the Prometheus scraper at /metrics/, also enables profiling with the X-Profile header
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# share of requests profiled with cProfile, from 0 to 1
+METRICS_PROFILE_RATE = float(os.environ.get('METRICS_PROFILE_RATE') or 0)
+
+# users resolved for authentication are cached in every process for this number of seconds,
+# and with USER_CACHE_SHARED=true also in the default cache;
+# saves, deletes and User.objects.filter(...).update(...) invalidate the cached users,
+# changes made with raw SQL or by another application reach the other processes only after this timeout
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT') or 30)
+USER_CACHE_SHARED = os.environ.get('USER_CACHE_SHARED') == 'true'
+
+# number of threads, and so of database connections per process, that run the queries of the async views under ASGI
+ASYNC_DATABASE_WORKERS = int(os.environ.get('ASYNC_DATABASE_WORKERS') or 8)
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 AUTHENTICATION_BACKENDS = [
-    'users.backends.EmailBackend',
-    'users.backends.PhoneBackend',
+    'users.backends.EmailOrPhoneBackend',
 ]
 
 DJOSER = {
@@ -123,7 +194,7 @@ DJOSER = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -0,0 +1,213 @@
+from unittest import mock
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_UNKNOWN
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import SimpleTestCase
+
+from readify.db.postgresql_pool.pool import ConnectionPool, PoolTimeout, connection_pools, get_connection_pool
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+
+
+class FakeConnection:
+    """Stands in for a psycopg2 connection, only the attributes used by the pool are provided."""
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+        self.info = mock.Mock(transaction_status=TRANSACTION_STATUS_IDLE)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.broken:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        self.rollbacks += 1
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Checks ConnectionPool with fake connections and a fake clock."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('readify.db.postgresql_pool.pool.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def get_pool(self, **kwargs):
+        options = {'max_size': 2, 'max_lifetime': 60, 'check_interval': 10, 'timeout': 0, **kwargs}
+        return ConnectionPool('test', **options)
+
+    def test_released_connection_is_reused(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+
+        self.assertIs(pool.acquire(self.connect), connection)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.stats()['checkouts'], 2)
+
+    def test_acquire_times_out_when_all_connections_are_in_use(self):
+        pool = self.get_pool(max_size=1)
+        pool.acquire(self.connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(self.connect)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_failed_connect_frees_its_place(self):
+        pool = self.get_pool(max_size=1)
+
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.acquire(mock.Mock(side_effect=psycopg2.OperationalError))
+        self.assertIsNotNone(pool.acquire(self.connect))
+
+    def test_expired_connection_is_closed_instead_of_reused(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+
+        self.now += 61
+        new_connection = pool.acquire(self.connect)
+
+        self.assertIsNot(new_connection, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['connections'], 1)
+
+    def test_expired_connection_is_closed_on_release(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+
+        self.now += 61
+        pool.release(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['connections'], 0)
+
+    def test_idle_connection_failing_its_check_is_replaced(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+
+        connection.broken = True
+        self.now += 11
+        new_connection = pool.acquire(self.connect)
+
+        self.assertIsNot(new_connection, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+        self.assertEqual(pool.stats()['connections'], 1)
+
+    def test_recently_used_connection_is_not_checked(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+
+        connection.broken = True
+        self.now += 5
+
+        self.assertIs(pool.acquire(self.connect), connection)
+        self.assertEqual(pool.stats()['failed_checks'], 0)
+
+    def test_connection_released_in_a_transaction_is_rolled_back(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+        connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        pool.release(connection)
+
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIs(pool.acquire(self.connect), connection)
+
+    def test_connection_failing_its_rollback_is_closed(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+        connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        connection.broken = True
+        pool.release(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['connections'], 0)
+
+    def test_connection_in_an_unknown_state_is_closed(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+        connection.info.transaction_status = TRANSACTION_STATUS_UNKNOWN
+        pool.release(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(connection.rollbacks, 0)
+
+    def test_forked_process_does_not_release_the_connections_of_its_parent(self):
+        pool = self.get_pool()
+        connection = pool.acquire(self.connect)
+
+        with mock.patch('os.getpid', return_value=pool.pid + 1):
+            pool.release(connection)
+
+        self.assertFalse(connection.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+
+    @mock.patch.dict(connection_pools, clear=True)
+    def test_forked_process_gets_a_pool_of_its_own(self):
+        pool = get_connection_pool('test', {'database': 'readify'}, {})
+
+        self.assertIs(get_connection_pool('test', {'database': 'readify'}, {}), pool)
+        with mock.patch('os.getpid', return_value=pool.pid + 1):
+            child_pool = get_connection_pool('test', {'database': 'readify'}, {})
+        self.assertIsNot(child_pool, pool)
+        self.assertEqual(child_pool.pid, pool.pid + 1)
+
+
+class ConnectionPoolDatabaseTests(SimpleTestCase):
+    """Checks the pooled backend against the configured database."""
+    databases = {DEFAULT_DB_ALIAS}
+
+    def setUp(self):
+        if connection.settings_dict['ENGINE'] != 'readify.db.postgresql_pool':
+            self.skipTest('The default database does not use the connection pool.')
+
+    def test_closed_connection_is_given_back_to_the_pool(self):
+        wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        raw_connection = wrapper.connection
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        idle = wrapper.pool.stats()['idle']
+
+        wrapper.close()
+        self.assertEqual(wrapper.pool.stats()['idle'], idle + 1)
+
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw_connection)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
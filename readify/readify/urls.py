@@ -4,10 +4,11 @@ from rest_framework_simplejwt.views import (
 )
 
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 
+from readify.metrics import metrics_view, profiles_view
+from store.views import serve_media
 from users.api.views import TokenWithEmailObtainPairView
 
 urlpatterns = [
@@ -17,7 +18,19 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('api/', include('store.api.urls')),
+    path('metrics/', metrics_view, name='metrics'),
+    path('metrics/profiles/', profiles_view, name='metrics-profiles'),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-urlpatterns += [path('silk/', include('silk.urls', namespace='silk'))]
+if settings.SERVE_MEDIA:
+    # in production the media files are served by the web server, see MEDIA_ROOT in the settings
+    urlpatterns += [
+        re_path(
+            rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.*)$',
+            serve_media,
+            {'document_root': settings.MEDIA_ROOT},
+            name='media',
+        ),
+    ]
+if settings.SILK_ENABLED:
+    urlpatterns += [path('silk/', include('silk.urls', namespace='silk'))]
@@ -0,0 +1,289 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial, update_wrapper
+
+from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.response import Response
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Subquery
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.views import View
+
+from store.api.serializers import BookDetailSerializer, BookListRowsSerializer
+from store.api.views import (
+    AuthorBookListAPIView,
+    AuthorDetailRetrieveAPIView,
+    BookDetailRetrieveAPIView,
+    BookListAPIView,
+    BookReviewListAPIView,
+    CategoryListAPIView,
+    PublisherBookListAPIView,
+    PublisherDetailRetrieveAPIView,
+)
+from store.models import Author, Book, Category, Language, Paper, Publisher, Review
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_database_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DATABASE_WORKERS,
+                thread_name_prefix='async-database',
+            )
+        return _executor
+
+
+def shutdown_database_executor():
+    """Closes the connections of the database threads and stops them, the next call starts new ones."""
+    global _executor
+
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        for _ in range(executor._max_workers):
+            executor.submit(connections.close_all)
+        executor.shutdown(wait=True)
+
+
+def call_in_database_thread(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # the pooled connections go back to the pool, the others are kept by the threads unless they are broken
+        for connection in connections.all():
+            if connection.errors_occurred or getattr(connection, 'pool', None) is not None:
+                connection.close_if_unusable_or_obsolete()
+
+
+async def run_in_database_thread(func, *args, **kwargs):
+    """
+    Runs a function that queries the database in the bounded pool of ASYNC_DATABASE_WORKERS threads,
+    so the event loop never blocks on the database and the number of connections opened
+    by the async views stays bounded. The function sees the context variables of the caller.
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(copy_context().run, call_in_database_thread, func, *args, **kwargs)
+    return await loop.run_in_executor(get_database_executor(), call)
+
+
+class AsyncView(View):
+    """
+    Base class of the views with asynchronous handlers.
+    Django 3.2 only serves a class-based view asynchronously when as_view() returns a coroutine function,
+    the handlers that aren't asynchronous, like the one of a method that isn't allowed, are returned as they are.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+
+        update_wrapper(async_view, view)
+        return async_view
+
+
+class AsyncBridgeView(AsyncView):
+    """
+    This view serves a synchronous DRF view asynchronously: the view is called and its response
+    is rendered in the database thread pool, so the list endpoints keep their filters, pagination and caches.
+    """
+    view_class = None
+
+    async def get(self, request, *args, **kwargs):
+        return await run_in_database_thread(self.render_view, request, *args, **kwargs)
+
+    def render_view(self, request, *args, **kwargs):
+        response = self.view_class.as_view()(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+
+class AsyncCategoryListView(AsyncBridgeView):
+    view_class = CategoryListAPIView
+
+
+class AsyncBookListView(AsyncBridgeView):
+    view_class = BookListAPIView
+
+
+class AsyncBookReviewListView(AsyncBridgeView):
+    view_class = BookReviewListAPIView
+
+
+class AsyncPublisherBookListView(AsyncBridgeView):
+    view_class = PublisherBookListAPIView
+
+
+class AsyncAuthorBookListView(AsyncBridgeView):
+    view_class = AuthorBookListAPIView
+
+
+class AsyncAPIView(AsyncView):
+    """
+    Base class of the async views that answer like their DRF view, view_class.
+    An instance of view_class authenticates the request, checks its permissions, negotiates the renderer
+    and derives the conditional GET validators in the database thread pool, see ConditionalGetMixin,
+    so a matching conditional request is answered with 304 before any data is loaded.
+    The data is loaded by get_data() and the response and the errors are rendered by view_class as well.
+    """
+    view_class = None
+
+    async def get(self, request, *args, **kwargs):
+        return await self.handle(request, self.get_response, *args, **kwargs)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return await self.handle(request, self.method_not_allowed, *args, **kwargs)
+
+    async def handle(self, request, respond, *args, **kwargs):
+        view = self.view_class()
+        view.args, view.kwargs = args, kwargs
+        view.request = request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+
+        try:
+            response = await respond(view, request, *args, **kwargs)
+        except Exception as error:
+            response = await run_in_database_thread(view.handle_exception, error)
+        return await run_in_database_thread(self.render_response, view, request, response, *args, **kwargs)
+
+    async def get_response(self, view, request, *args, **kwargs):
+        etag, last_modified = await run_in_database_thread(self.get_validators, view, request, *args, **kwargs)
+        response = None
+        if etag is not None:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(await self.get_data(request, *args, **kwargs))
+
+        if etag is not None:
+            view.set_validators(response, etag, last_modified)
+        return response
+
+    async def method_not_allowed(self, view, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
+
+    async def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    @staticmethod
+    def get_validators(view, request, *args, **kwargs):
+        view.initial(request, *args, **kwargs)
+        return view.get_validators(request)
+
+    @staticmethod
+    def render_response(view, request, response, *args, **kwargs):
+        response = view.finalize_response(request, response, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+
+class AsyncBookDetailView(AsyncAPIView):
+    """
+    This view returns the same details of a book as BookDetailRetrieveAPIView,
+    but the book, its relations and its latest reviews with the parent categories
+    are loaded by three concurrent calls in the database thread pool,
+    so a request never takes more than three of its threads.
+    The parent categories are selected by the path of the book's category with a subquery,
+    so they don't have to wait for the book.
+    """
+    view_class = BookDetailRetrieveAPIView
+
+    async def get_data(self, request, pk):
+        book, relations, (reviews, parent_categories) = await asyncio.gather(
+            run_in_database_thread(self.get_book, pk),
+            run_in_database_thread(self.get_relations, pk),
+            run_in_database_thread(lambda: (self.get_latest_reviews(pk), self.get_parent_categories(pk))),
+        )
+        if book is None:
+            raise Http404('Книгу не знайдено')
+
+        book._prefetched_objects_cache = relations
+        context = {'request': request, 'latest_reviews': reviews, 'parent_categories': parent_categories}
+        return await run_in_database_thread(lambda: BookDetailSerializer(book, context=context).data)
+
+    @staticmethod
+    def get_book(pk):
+        return BookDetailRetrieveAPIView.queryset.prefetch_related(None).filter(pk=pk).first()
+
+    @staticmethod
+    def get_relations(pk):
+        return {
+            'publisher': list(Publisher.objects.filter(books=pk).only('title', 'slug')),
+            'author': list(Author.objects.filter(books=pk).only('title', 'slug')),
+            'paper': list(Paper.objects.filter(book=pk)),
+            'language': list(Language.objects.filter(book=pk)),
+        }
+
+    @staticmethod
+    def get_latest_reviews(pk):
+        return list(Review.objects.filter(book=pk).select_related('user').only(
+            'id', 'user', 'title', 'content', 'rating', 'created', 'user__first_name', 'user__last_name'
+        ).order_by('-created', '-id')[:BookDetailSerializer.latest_reviews_limit])
+
+    @staticmethod
+    def get_parent_categories(pk):
+        book_category_path = Book.objects.filter(pk=pk).values('category__path')[:1]
+        return list(Category.objects.annotate(
+            book_category_path=Subquery(book_category_path),
+        ).filter(
+            book_category_path__startswith=F('path'),
+        ).exclude(
+            path=F('book_category_path'),
+        ).only('id', 'title').order_by('-depth'))
+
+
+class AsyncNestedBooksDetailView(AsyncAPIView):
+    """
+    This view returns the same details of a publisher or an author as their DRF views,
+    loading the object, its latest books and the number of its books concurrently in the database thread pool.
+    """
+    model = None
+
+    async def get_data(self, request, pk):
+        obj, books, books_count = await asyncio.gather(
+            run_in_database_thread(self.model.objects.filter(pk=pk).first),
+            run_in_database_thread(self.get_books, pk),
+            run_in_database_thread(self.get_books_count, pk),
+        )
+        if obj is None:
+            raise Http404(f'{self.model._meta.verbose_name.capitalize()} не знайдено')
+
+        serializer_class = self.view_class.serializer_class
+        context = {'request': request, 'books': books, 'books_count': books_count}
+        return await run_in_database_thread(lambda: serializer_class(obj, context=context).data)
+
+    def get_books(self, pk):
+        relation = self.model._meta.model_name
+        return list(Book.objects.filter(**{relation: pk}).order_by('-id').values(
+            *BookListRowsSerializer.fields,
+        )[:self.view_class.serializer_class.books_limit])
+
+    def get_books_count(self, pk):
+        relation = self.model._meta.model_name
+        return getattr(Book, relation).through.objects.filter(**{f'{relation}_id': pk}).count()
+
+
+class AsyncPublisherDetailView(AsyncNestedBooksDetailView):
+    model = Publisher
+    view_class = PublisherDetailRetrieveAPIView
+
+
+class AsyncAuthorDetailView(AsyncNestedBooksDetailView):
+    model = Author
+    view_class = AuthorDetailRetrieveAPIView
@@ -0,0 +1,76 @@
+from hashlib import sha1
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from store.cache import get_versions, is_replicated
+
+
+class ConditionalGetMixin:
+    """
+    This mixin answers GET requests with strong ETag and Last-Modified validators
+    and returns 304 Not Modified for matching If-None-Match / If-Modified-Since requests
+    before the object is loaded or any serializer runs.
+
+    The validators are derived from the version stamps of the namespaces listed in version_namespaces
+    (bumped whenever a model of the namespace is saved or deleted)
+    and, for detail views, from the updated_at timestamp of the requested object.
+    A response read from a replica right after a change of its namespaces isn't validated,
+    as the replica may not have received the change yet.
+    """
+    version_namespaces = ()
+    modification_field = None
+
+    def get_object_modified(self):
+        """Returns the modification time of the requested object, or None for list views."""
+        if self.modification_field is None:
+            return None
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.get_queryset().model.objects.filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).values_list(self.modification_field, flat=True).first()
+
+    def get_validators(self, request):
+        versions = get_versions(*self.version_namespaces)
+        if not all(is_replicated(version) for version in versions.values()):
+            return None, None
+        timestamps = [version / 1e9 for version in versions.values()]
+
+        object_modified = self.get_object_modified()
+        if self.modification_field is not None:
+            if object_modified is None:
+                return None, None
+            timestamps.append(object_modified.timestamp())
+
+        fingerprint = '|'.join((
+            request.get_full_path(),
+            request.accepted_media_type or '',
+            object_modified.isoformat() if object_modified else '',
+            *(f'{namespace}:{version}' for namespace, version in sorted(versions.items())),
+        ))
+        etag = quote_etag(sha1(fingerprint.encode('utf-8')).hexdigest())
+        last_modified = int(max(timestamps)) if timestamps else None
+
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if etag is None:
+            return super().get(request, *args, **kwargs)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        self.set_validators(response, etag, last_modified)
+        return response
+
+    @staticmethod
+    def set_validators(response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Accept',))
@@ -32,9 +32,10 @@ class BookCategorySerializer(ModelSerializer):
     The parent_categories field is defined as a SerializerMethodField,
     indicating that its value is derived from a custom method called get_parent_categories.
     This method uses the get_parent_categories_from_child_to_parent function to retrieve the parent categories
-    of the current category (obj).
+    of the current category (obj) with a single query based on its materialized path.
     The parent categories are then serialized using the CategorySerializer
     and returned as the value of the parent_categories field.
+    Parent categories already loaded by the caller can be passed as "parent_categories" in the context.
     """
     parent_categories = SerializerMethodField()
 
@@ -42,8 +43,9 @@ class BookCategorySerializer(ModelSerializer):
         model = Category
         fields = ('title', 'parent_categories')
 
-    @staticmethod
-    def get_parent_categories(obj):
+    def get_parent_categories(self, obj):
+        if 'parent_categories' in self.context:
+            return CategorySerializer(self.context['parent_categories'], many=True).data
         subcategories = get_parent_categories_from_child_to_parent(obj, CategorySerializer)
         return subcategories
 
@@ -0,0 +1,206 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from django.db.models import Q
+
+
+class KeysetPagination(BasePagination):
+    """
+    This pagination class implements keyset (cursor) pagination over a composite ordering.
+
+    The ordering is taken from the OrderingFilter of the view, or from the ordering the queryset
+    already has (for example the relevance of the search results), or from the default ordering,
+    and the unique tiebreaker field is always appended to it, so the order of rows is stable.
+    The cursor holds the values of the ordering fields of the last (or first) row of the page,
+    and the next page is selected with a "(price, id) > (last price, last id)" predicate
+    instead of OFFSET, so every page costs the same as the first one when the ordering is indexed.
+
+    The page size can be changed by the client but never exceeds max_page_size.
+    The total number of rows is returned only when it is requested with ?count=true,
+    because COUNT(*) of a filtered queryset is expensive by itself.
+    Rows can be both model instances and dictionaries returned by values().
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('-id',)
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Невірний курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.current_ordering = self.get_ordering(request, queryset, view)
+        position, reverse = self.decode_cursor(request)
+
+        self.count = None
+        if self.is_count_requested(request):
+            self.count = queryset.order_by().count()
+
+        ordering = self.current_ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        response_data = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count is not None:
+            response_data['count'] = self.count
+        response_data['results'] = data
+
+        return Response(response_data)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def is_count_requested(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Returns the ordering of the page as a tuple of field names with the tiebreaker at the end.
+        """
+        ordering = None
+
+        if view is not None and any(
+            issubclass(backend, OrderingFilter) for backend in getattr(view, 'filter_backends', ())
+        ):
+            ordering = OrderingFilter().get_ordering(request, queryset, view)
+
+        if not ordering and queryset.query.order_by and all(
+            isinstance(field, str) for field in queryset.query.order_by
+        ):
+            ordering = queryset.query.order_by
+
+        ordering = tuple(ordering or self.ordering)
+        if self.tiebreaker not in (field.lstrip('-') for field in ordering):
+            ordering += (f'-{self.tiebreaker}' if ordering[0].startswith('-') else self.tiebreaker,)
+
+        return ordering
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_keyset_filter(ordering, position):
+        """
+        Builds the row comparison of the ordering fields with the cursor position
+        as (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ..., where every comparison
+        follows the direction of its own field.
+        The comparison is bounded by f1 >= v1 as well, as PostgreSQL can't start
+        the index scan of (f1, f2) at the cursor from the OR alone.
+        """
+        keyset_filter = Q()
+        equal_fields = {}
+
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            keyset_filter |= Q(**equal_fields, **{f'{name}__{lookup}': value})
+            equal_fields[name] = value
+
+        if len(ordering) > 1:
+            field, value = ordering[0], position[0]
+            lookup = 'lte' if field.startswith('-') else 'gte'
+            keyset_filter &= Q(**{f'{field.lstrip("-")}__{lookup}': value})
+
+        return keyset_filter
+
+    def get_position(self, row):
+        position = []
+
+        for field in self.current_ordering:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            position.append(value if isinstance(value, int) else str(value))
+
+        return position
+
+    @staticmethod
+    def make_cursor(ordering, position, reverse=False):
+        cursor = json.dumps({'o': ordering, 'p': position, 'r': int(reverse)})
+        return urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+    def encode_cursor(self, position, reverse):
+        encoded = self.make_cursor(self.current_ordering, position, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """
+        Returns the position and the direction stored in the cursor of the request.
+        A cursor made for another ordering is rejected.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            ordering, position, reverse = tuple(cursor['o']), cursor['p'], bool(cursor['r'])
+        except (BinasciiError, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if ordering != self.current_ordering or not isinstance(position, list) \
+                or len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
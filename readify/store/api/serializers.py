@@ -1,4 +1,4 @@
-from rest_framework.fields import SerializerMethodField, FloatField
+from rest_framework.fields import SerializerMethodField, DecimalField
 from rest_framework.serializers import ModelSerializer
 
 from store.api.nested_serializers import (
@@ -10,6 +10,7 @@ from store.api.nested_serializers import (
     BookLanguageSerializer,
     BookReviewSerializer,
 )
+from store.images import get_thumbnail_data
 from store.models import (
     Category,
     Book,
@@ -17,6 +18,7 @@ from store.models import (
     Author,
     Review,
 )
+from store.ratings import RATING_COUNT_FIELDS
 
 
 class CategoryListSerializer(ModelSerializer):
@@ -25,7 +27,7 @@ class CategoryListSerializer(ModelSerializer):
     It includes the fields id, title, slug, and a custom field subcategories.
     The subcategories field is defined as a SerializerMethodField,
     which means its value is derived from a custom method called get_subcategories.
-    This method retrieves the related subcategories of the category
+    This method takes the subcategories already assembled in memory by build_category_tree
     and serializes them using the same serializer class (CategoryListSerializer) recursively.
     The serialized subcategories are then returned as the value of the subcategories field.
     The Meta class within the serializer specifies the model (Category)
@@ -40,17 +42,84 @@ class CategoryListSerializer(ModelSerializer):
         fields = ('id', 'title', 'slug', 'subcategories')
 
     def get_subcategories(self, obj):
-        subcategories = obj.subcategories.all()
-        serializer = self.__class__(subcategories, many=True)
+        serializer = self.__class__(obj.children, many=True)
         return serializer.data
 
 
-class BookListSerializer(ModelSerializer):
+class ImageThumbnailMixin:
+    """
+    This mixin serializes the thumbnail generated from the image of an object
+    as the URLs of its JPEG and WebP versions together with its dimensions.
+    """
+    image_field = 'image'
+    variants_field = 'image_variants'
+
+    def get_thumbnail(self, obj):
+        return get_thumbnail_data(
+            getattr(obj, self.variants_field),
+            getattr(obj, self.image_field).storage,
+            self.context.get('request'),
+        )
+
+
+class BookListSerializer(ImageThumbnailMixin, ModelSerializer):
     author = AuthorSerializer(many=True)
+    cover_thumbnail = SerializerMethodField(method_name='get_thumbnail')
+    image_field = 'cover_image'
+    variants_field = 'cover_variants'
 
     class Meta:
         model = Book
-        fields = ('id', 'title', 'price', 'slug', 'cover_image', 'author')
+        fields = ('id', 'title', 'price', 'slug', 'cover_image', 'cover_thumbnail', 'author')
+
+
+class BookListRowsSerializer:
+    """
+    This class is a model-free counterpart of BookListSerializer that produces the same JSON.
+    It takes dictionaries returned by values() instead of model instances,
+    loads the names of the authors of all the books with one additional query
+    and formats the scalar fields directly, without the ModelSerializer field machinery.
+    It is used by every endpoint that returns lists of book cards.
+    """
+    fields = ('id', 'title', 'price', 'slug', 'cover_image', 'cover_variants')
+    price_field = DecimalField(max_digits=6, decimal_places=2)
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @property
+    def data(self):
+        authors = {}
+        author_rows = Book.author.through.objects.filter(
+            book_id__in=[row['id'] for row in self.rows]
+        ).order_by('id').values_list('book_id', 'author__title')
+        for book_id, author_title in author_rows:
+            authors.setdefault(book_id, []).append({'title': author_title})
+
+        storage = Book._meta.get_field('cover_image').storage
+        request = self.context.get('request')
+        to_price = self.price_field.to_representation
+
+        data = []
+        for row in self.rows:
+            cover_image = None
+            if row['cover_image']:
+                cover_image = storage.url(row['cover_image'])
+                if request is not None:
+                    cover_image = request.build_absolute_uri(cover_image)
+
+            data.append({
+                'id': row['id'],
+                'title': row['title'],
+                'price': to_price(row['price']),
+                'slug': row['slug'],
+                'cover_image': cover_image,
+                'cover_thumbnail': get_thumbnail_data(row['cover_variants'], storage, request),
+                'author': authors.get(row['id'], []),
+            })
+
+        return data
 
 
 class BookDetailSerializer(ModelSerializer):
@@ -59,32 +128,78 @@ class BookDetailSerializer(ModelSerializer):
     author = BookAuthorSerializer(many=True)
     paper = BookPaperSerializer(many=True)
     language = BookLanguageSerializer(many=True)
-    reviews = BookReviewSerializer(many=True)
-    average_rating = FloatField()
+    reviews = SerializerMethodField()
+    average_rating = SerializerMethodField()
+    ratings = SerializerMethodField()
 
     class Meta:
         model = Book
         fields = (
             'title', 'category', 'cover_image', 'price', 'slug',
             'publisher', 'author', 'paper', 'language',
-            'weight', 'edition', 'amount_pages', 'isbn', 'reviews', 'average_rating'
+            'weight', 'edition', 'amount_pages', 'isbn', 'reviews',
+            'average_rating', 'review_count', 'ratings'
         )
 
+    latest_reviews_limit = 3
+
+    def get_reviews(self, obj):
+        if 'latest_reviews' in self.context:
+            return BookReviewSerializer(self.context['latest_reviews'], many=True).data
+        reviews = Review.objects.filter(book=obj).select_related('user').only(
+            'id', 'user', 'title', 'content', 'rating', 'created', 'user__first_name', 'user__last_name'
+        ).order_by('-created', '-id')[:self.latest_reviews_limit]
+        return BookReviewSerializer(reviews, many=True).data
+
+    @staticmethod
+    def get_average_rating(obj):
+        return obj.average_rating if obj.review_count else None
+
+    @staticmethod
+    def get_ratings(obj):
+        return {rating: getattr(obj, field) for rating, field in RATING_COUNT_FIELDS.items()}
+
+
+class NestedBooksMixin:
+    """
+    This mixin embeds only the latest books_limit books of a publisher or an author
+    together with the total number of their books.
+    The rest of the books are paged through the dedicated books endpoints.
+    The books and their number already loaded by the caller can be passed as "books" and "books_count"
+    in the context.
+    """
+    books_limit = 12
+
+    def get_books(self, obj):
+        books = self.context.get('books')
+        if books is None:
+            books = obj.books.order_by('-id').values(*BookListRowsSerializer.fields)[:self.books_limit]
+        return BookListRowsSerializer(books, context=self.context).data
+
+    def get_books_count(self, obj):
+        if 'books_count' in self.context:
+            return self.context['books_count']
+        return obj.books.through.objects.filter(**{obj._meta.model_name: obj}).count()
+
 
-class PublisherDetailSerializer(ModelSerializer):
-    books = BookListSerializer(many=True)
+class PublisherDetailSerializer(NestedBooksMixin, ImageThumbnailMixin, ModelSerializer):
+    books = SerializerMethodField()
+    books_count = SerializerMethodField()
+    image_thumbnail = SerializerMethodField(method_name='get_thumbnail')
 
     class Meta:
         model = Publisher
-        fields = ('id', 'title', 'image', 'description', 'slug', 'books')
+        fields = ('id', 'title', 'image', 'image_thumbnail', 'description', 'slug', 'books', 'books_count')
 
 
-class AuthorDetailSerializer(ModelSerializer):
-    books = BookListSerializer(many=True)
+class AuthorDetailSerializer(NestedBooksMixin, ImageThumbnailMixin, ModelSerializer):
+    books = SerializerMethodField()
+    books_count = SerializerMethodField()
+    image_thumbnail = SerializerMethodField(method_name='get_thumbnail')
 
     class Meta:
         model = Author
-        fields = ('id', 'title', 'image', 'biography', 'slug', 'books')
+        fields = ('id', 'title', 'image', 'image_thumbnail', 'biography', 'slug', 'books', 'books_count')
 
 
 class ReviewCreateSerializer(ModelSerializer):
@@ -4,16 +4,43 @@ from .views import (
     CategoryListAPIView,
     BookListAPIView,
     BookDetailRetrieveAPIView,
+    BookReviewListAPIView,
     PublisherDetailRetrieveAPIView,
+    PublisherBookListAPIView,
     AuthorDetailRetrieveAPIView,
-    ReviewCreateAPIView
+    AuthorBookListAPIView,
+    ReviewCreateAPIView,
+    CatalogueExportAPIView,
+)
+from .async_views import (
+    AsyncCategoryListView,
+    AsyncBookListView,
+    AsyncBookDetailView,
+    AsyncBookReviewListView,
+    AsyncPublisherDetailView,
+    AsyncPublisherBookListView,
+    AsyncAuthorDetailView,
+    AsyncAuthorBookListView,
 )
 
 urlpatterns = [
     path('category/list/', CategoryListAPIView.as_view(), name='category-list'),
     path('book/list/', BookListAPIView.as_view(), name='book-list'),
     path('book/detail/<int:pk>/', BookDetailRetrieveAPIView.as_view(), name='book-detail'),
+    path('book/<int:pk>/reviews/', BookReviewListAPIView.as_view(), name='book-reviews'),
     path('publisher/detail/<int:pk>/', PublisherDetailRetrieveAPIView.as_view(), name='publisher-detail'),
+    path('publisher/<int:pk>/books/', PublisherBookListAPIView.as_view(), name='publisher-books'),
     path('author/detail/<int:pk>/', AuthorDetailRetrieveAPIView.as_view(), name='author-detail'),
+    path('author/<int:pk>/books/', AuthorBookListAPIView.as_view(), name='author-books'),
     path('review/create/', ReviewCreateAPIView.as_view(), name='review-create'),
+    path('catalogue/export/', CatalogueExportAPIView.as_view(), name='catalogue-export'),
+    # the read endpoints served asynchronously under ASGI
+    path('async/category/list/', AsyncCategoryListView.as_view(), name='async-category-list'),
+    path('async/book/list/', AsyncBookListView.as_view(), name='async-book-list'),
+    path('async/book/detail/<int:pk>/', AsyncBookDetailView.as_view(), name='async-book-detail'),
+    path('async/book/<int:pk>/reviews/', AsyncBookReviewListView.as_view(), name='async-book-reviews'),
+    path('async/publisher/detail/<int:pk>/', AsyncPublisherDetailView.as_view(), name='async-publisher-detail'),
+    path('async/publisher/<int:pk>/books/', AsyncPublisherBookListView.as_view(), name='async-publisher-books'),
+    path('async/author/detail/<int:pk>/', AsyncAuthorDetailView.as_view(), name='async-author-detail'),
+    path('async/author/<int:pk>/books/', AsyncAuthorBookListView.as_view(), name='async-author-books'),
 ]
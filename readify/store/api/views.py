@@ -1,13 +1,26 @@
+from decimal import Decimal
+
 from django_filters import rest_framework as filters
-from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView, get_object_or_404
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
 
-from django.db.models import Prefetch, Avg
-from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.http import urlencode
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
 
+from .mixins import ConditionalGetMixin
+from .nested_serializers import BookReviewSerializer
+from .pagination import KeysetPagination
 from .serializers import (
     CategoryListSerializer,
     BookListSerializer,
+    BookListRowsSerializer,
     BookDetailSerializer,
     PublisherDetailSerializer,
     AuthorDetailSerializer,
@@ -20,101 +33,297 @@ from store.models import (
     Publisher,
     Review,
 )
-from store.filters import BookListFilter
-
-
-class CategoryListAPIView(ListAPIView):
-    """
-    This class-based view returns a list of categories,
-    where each category may have subcategories up to four levels deep.
-
-    In fact, the nesting of subcategories can be infinite,
-    but it is assumed that there will be no more than 4 of them.
-    Accordingly, if the nesting is greater,
-    then this provokes the "n + 1" problem and may affect performance.
-    """
-    queryset = Category.objects.filter(parent=None).prefetch_related(
-        Prefetch('subcategories', queryset=Category.objects.prefetch_related(
-            Prefetch('subcategories', queryset=Category.objects.prefetch_related(
-                Prefetch('subcategories', queryset=Category.objects.prefetch_related(
-                    Prefetch('subcategories', queryset=Category.objects.prefetch_related(
-                        Prefetch('subcategories', queryset=Category.objects.all())
-                    ))
-                ))
-            ))
-        ))
-    )
+from store.cache import TaggedCache, VersionedCache
+from store.catalogue import iter_catalogue_rows, render_catalogue_rows
+from store.facets import FACET_FILTER_PARAMS, FACETS, count_facets
+from store.filters import BookListFilter, BookSearchFilter
+from store.ratings import RATING_FIELDS
+from store.utils import build_category_tree
+
+category_tree_cache = VersionedCache('category')
+book_list_cache = TaggedCache('book-list', max_entries=1024)
+book_facet_cache = TaggedCache('book-facets', max_entries=256)
+# the read-only endpoints are the same for every user, so an access token is only verified
+# and turned into a stateless TokenUser without loading the user from the database
+READ_ONLY_AUTHENTICATION_CLASSES = [JWTTokenUserAuthentication]
+
+
+class CategoryListAPIView(ConditionalGetMixin, ListAPIView):
+    """
+    This class-based view returns a list of categories with their subcategories of any depth.
+
+    All categories are loaded with a single query ordered by the materialized path,
+    so parents always come before their children,
+    and the tree is assembled in memory without any additional queries.
+
+    The serialized tree is kept in the versioned category cache
+    and is rendered again only after a category has been saved or deleted.
+    Conditional requests are answered with 304 while the category version is unchanged.
+    """
+    queryset = Category.objects.order_by('path').only('id', 'title', 'slug', 'parent', 'path')
     serializer_class = CategoryListSerializer
+    authentication_classes = READ_ONLY_AUTHENTICATION_CLASSES
+    version_namespaces = ('category',)
+
+    def list(self, request, *args, **kwargs):
+        return Response(category_tree_cache.get_or_set('tree', self.render_tree))
 
+    def render_tree(self):
+        categories = build_category_tree(self.get_queryset())
+        serializer = self.get_serializer(categories, many=True)
+        return serializer.data
 
-class BookListAPIView(ListAPIView):
+
+class BookListAPIView(ConditionalGetMixin, ListAPIView):
     """
-    This endpoint is a class-based view that provides a paginated list of books.
-    It retrieves all books from the database and prefetches related authors,
-    selecting specific fields for optimization.
-    It uses a serializer class to convert the model instances into JSON.
-    The endpoint supports filtering, searching,
-    and ordering by different criteria such as title, author, publisher, and price.
+    This endpoint is a class-based view that provides a list of books paginated with a cursor.
+    Books are read as values() rows and serialized by BookListRowsSerializer,
+    which produces the same JSON as BookListSerializer without instantiating models,
+    and the authors of the whole page are loaded with one query.
+    Rendered pages are kept in a process-local LRU cache keyed by the canonical query string
+    and tagged with the ids they depend on, so saving a book, author or publisher
+    evicts only the affected pages.
+    The endpoint supports filtering, full-text searching by title, author and publisher
+    with results ordered by relevance, and ordering by price or average rating.
+    Conditional requests are answered with 304 while no book, author, publisher,
+    category, language or review has changed.
+
+    With ?facets=true (or a comma-separated list of facets) the page also carries the numbers of books
+    of every category, author, publisher and language and a price histogram for the current selection,
+    each facet counted without its own filter and all of them with one UNION ALL query.
+    The counts of the unfiltered and lightly filtered lists are cached until any book or related object changes.
     """
-    queryset = Book.objects.all().prefetch_related(
-        Prefetch('author', queryset=Author.objects.all().only('id', 'title')),
-    ).only('id', 'title', 'price', 'slug', 'cover_image')
+    queryset = Book.objects.all()
     serializer_class = BookListSerializer
-    filter_backends = (filters.DjangoFilterBackend, SearchFilter, OrderingFilter)
+    authentication_classes = READ_ONLY_AUTHENTICATION_CLASSES
+    filter_backends = (filters.DjangoFilterBackend, BookSearchFilter, OrderingFilter)
     filterset_class = BookListFilter
-    search_fields = (
-        'title',
-        'author__title',
-        'publisher__title',
-    )
-    ordering_fields = ('price',)
+    ordering_fields = ('price', 'average_rating')
+    pagination_class = KeysetPagination
+    version_namespaces = ('book', 'author', 'publisher', 'category', 'language', 'review')
+
+    tag_filters = ('category', 'author', 'publisher', 'language')
+    scope_field = None
+    facets_query_param = 'facets'
+    # set when nothing matches the full-text search, see BookSearchFilter
+    search_fallback = False
+    # facet counts are cached only for lists with at most this number of filters, including the search
+    facet_cache_max_filters = 1
+
+    def list(self, request, *args, **kwargs):
+        self.facets = self.get_requested_facets()
+        return Response(book_list_cache.get_or_set(self.get_cache_key(request), self.render_list))
+
+    def get_requested_facets(self):
+        value = self.request.query_params.get(self.facets_query_param, '').strip()
+        if not value or value.lower() in ('0', 'false', 'no'):
+            return ()
+        if value.lower() in ('1', 'true', 'yes'):
+            return FACETS
+
+        facets = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        if not set(facets) <= set(FACETS):
+            raise ValidationError({self.facets_query_param: f'Підтримувані фасети: {", ".join(FACETS)}.'})
+        return facets
+
+    @staticmethod
+    def get_cache_key(request):
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values if value
+        )
+        return request.get_host(), request.path, urlencode(params)
+
+    def get_rows(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        # the rows carry the ordering fields too, the pagination cursor is built from them
+        return queryset.values(*dict.fromkeys((
+            *BookListRowsSerializer.fields, *self.ordering_fields, *queryset.query.annotations,
+        )))
+
+    def render_list(self):
+        rows = self.get_rows()
+        page = self.paginate_queryset(rows)
+        if page == [] and self.request.query_params.get(BookSearchFilter.search_param) and not self.search_fallback:
+            # nothing matches the full-text search, the books with similar titles are listed instead
+            self.search_fallback = True
+            rows = self.get_rows()
+            page = self.paginate_queryset(rows)
+
+        if page is not None:
+            serializer = BookListRowsSerializer(page, context=self.get_serializer_context())
+            data = self.get_paginated_response(serializer.data).data
+            tags = self.get_cache_tags(data['results'])
+            if self.facets:
+                data['facets'] = self.get_facets()
+                tags.update(self.get_facet_tags())
+            return data, tags
+
+        data = BookListRowsSerializer(list(rows), context=self.get_serializer_context()).data
+        return data, self.get_cache_tags(data)
+
+    def get_cache_tags(self, results):
+        """
+        Returns the tags the cached list depends on: the values of the filters by related objects
+        (or "book:*" for lists not filtered by them, which any change of a book may affect),
+        the books of the list, and the search and the rating when the list depends on them.
+        """
+        params = self.request.query_params
+        tags = {f'{name}:{params[name]}' for name in self.tag_filters if params.get(name)}
+        if params.get('category_tree'):
+            # books moved between the subcategories, and subcategories moved within the tree
+            tags.update((f'category-tree:{int(Decimal(params["category_tree"]))}', 'category'))
+        if self.scope_field is not None:
+            tags.add(f'{self.scope_field}:{self.kwargs["pk"]}')
+        tags = tags or {'book:*'}
+        tags.update(f'book:{row["id"]}' for row in results)
+
+        if params.get(BookSearchFilter.search_param):
+            tags.add('search')
+        if 'average_rating' in params.get(OrderingFilter.ordering_param, '') or params.get('min_rating'):
+            tags.add('rating')
+
+        return tags
+
+    def get_facets(self):
+        """Returns the counts of the requested facets, from the facet cache for the lists with few filters."""
+        params = self.request.query_params
+        filters = sorted(
+            (name, params[name])
+            for name in (*self.filterset_class.base_filters, BookSearchFilter.search_param) if params.get(name)
+        )
+
+        def render():
+            # the search is applied and the filters are validated once,
+            # the facets differ only in the filters they leave out
+            books = BookSearchFilter().filter_queryset(self.request, self.get_queryset(), self)
+            filterset = self.filterset_class(params, queryset=books, request=self.request)
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors)
+
+            facet_books = {facet: self.filter_facet_books(filterset, facet) for facet in self.facets}
+            return count_facets(facet_books), self.get_facet_tags()
+
+        if len(filters) > self.facet_cache_max_filters:
+            return render()[0]
+        return book_facet_cache.get_or_set((self.request.path, urlencode(filters), self.facets), render)
 
+    @staticmethod
+    def filter_facet_books(filterset, facet):
+        books = filterset.queryset
+        for name, value in filterset.form.cleaned_data.items():
+            if name not in FACET_FILTER_PARAMS[facet]:
+                books = filterset.filters[name].filter(books, value)
+        return books
 
-class BookDetailRetrieveAPIView(RetrieveAPIView):
+    def get_facet_tags(self):
+        """Facets count all the books of the selection, so they depend on every book and its relations."""
+        params = self.request.query_params
+        tags = {'book', 'category', 'author', 'publisher', 'language'}
+        if params.get(BookSearchFilter.search_param):
+            tags.add('search')
+        if params.get('min_rating'):
+            tags.add('rating')
+        return tags
+
+
+class PublisherBookListAPIView(BookListAPIView):
+    """
+    This endpoint pages through all the books of a single publisher
+    with the same cursor pagination, filters, search and ordering as the book list.
+    """
+    scope_field = 'publisher'
+
+    def get_queryset(self):
+        publisher = get_object_or_404(Publisher.objects.only('id'), pk=self.kwargs['pk'])
+        return super().get_queryset().filter(publisher=publisher)
+
+
+class AuthorBookListAPIView(BookListAPIView):
+    """
+    This endpoint pages through all the books of a single author
+    with the same cursor pagination, filters, search and ordering as the book list.
+    """
+    scope_field = 'author'
+
+    def get_queryset(self):
+        author = get_object_or_404(Author.objects.only('id'), pk=self.kwargs['pk'])
+        return super().get_queryset().filter(author=author)
+
+
+class BookDetailRetrieveAPIView(ConditionalGetMixin, RetrieveAPIView):
     """
     This endpoint retrieves the details of a single book.
-    It optimizes the database queries by selecting related fields from the Publisher, Author, and Review models.
-    It calculates the average rating of the book's reviews and selects specific fields for serialization.
+    It optimizes the database queries by selecting related fields from the Publisher and Author models.
+    Only the latest reviews are embedded, the rest are paged through BookReviewListAPIView.
+    The parent categories of the book's category are resolved with one query from the category's materialized path.
+    The average rating and the rating histogram are read from the aggregates stored on the book,
+    so no reviews are aggregated on request. Specific fields are selected for serialization.
+    Conditional requests are validated against the modification time of the book
+    and the versions of the related models before the book is loaded.
     """
-    queryset = Book.objects.select_related('category__parent').prefetch_related(
+    queryset = Book.objects.select_related('category').prefetch_related(
         Prefetch('publisher', queryset=Publisher.objects.all().only('title', 'slug')),
         Prefetch('author', queryset=Author.objects.all().only('title', 'slug')),
-        Prefetch('reviews', queryset=Review.objects.select_related('user', 'book').only(
-            'id', 'title', 'content', 'rating', 'created',
-            'book__id', 'user__first_name', 'user__last_name').all())
-    ).annotate(average_rating=Avg('reviews__rating')).filter().only(
+    ).only(
         'title', 'category', 'cover_image', 'price', 'slug',
         'publisher', 'author', 'paper', 'language',
-        'weight', 'edition', 'amount_pages', 'isbn')
+        'weight', 'edition', 'amount_pages', 'isbn', *RATING_FIELDS)
     serializer_class = BookDetailSerializer
+    authentication_classes = READ_ONLY_AUTHENTICATION_CLASSES
+    version_namespaces = ('author', 'publisher', 'category', 'paper', 'language', 'review')
+    modification_field = 'updated_at'
+
+
+class BookReviewListAPIView(ConditionalGetMixin, ListAPIView):
+    """
+    This endpoint pages through the reviews of a single book, newest first.
+    The pagination is keyset-based on (created, id),
+    backed by the composite index on the book, the creation date and the id of a review.
+    """
+    serializer_class = BookReviewSerializer
+    authentication_classes = READ_ONLY_AUTHENTICATION_CLASSES
+    pagination_class = KeysetPagination
+    version_namespaces = ('review',)
+
+    def get_queryset(self):
+        book = get_object_or_404(Book.objects.only('id'), pk=self.kwargs['pk'])
+        return Review.objects.filter(book=book).select_related('user').only(
+            'id', 'user', 'title', 'content', 'rating', 'created', 'user__first_name', 'user__last_name'
+        ).order_by('-created', '-id')
 
 
-class PublisherDetailRetrieveAPIView(RetrieveAPIView):
+class PublisherDetailRetrieveAPIView(ConditionalGetMixin, RetrieveAPIView):
     """
     This endpoint retrieves detailed information about a single publisher.
-    It optimizes database queries by prefetching related books and authors,
-    selecting specific fields for serialization.
-    """
-    queryset = Publisher.objects.all().prefetch_related(
-        Prefetch('books', queryset=Book.objects.all().prefetch_related(
-            Prefetch('author', queryset=Author.objects.all().only('title'))
-        ).only('id', 'title', 'price', 'slug', 'cover_image'))
-    )
+    Only the latest books of the publisher and their total number are embedded,
+    they are read as values() rows and serialized without instantiating models by BookListRowsSerializer.
+    The rest of the books are paged through PublisherBookListAPIView.
+    Conditional requests are validated against the modification time of the publisher
+    and the versions of books and authors.
+    """
+    queryset = Publisher.objects.all()
     serializer_class = PublisherDetailSerializer
+    authentication_classes = READ_ONLY_AUTHENTICATION_CLASSES
+    version_namespaces = ('book', 'author')
+    modification_field = 'updated_at'
 
 
-class AuthorDetailRetrieveAPIView(RetrieveAPIView):
+class AuthorDetailRetrieveAPIView(ConditionalGetMixin, RetrieveAPIView):
     """
     This endpoint retrieves detailed information about a single author.
-    It optimizes database queries by prefetching related books and authors,
-    selecting specific fields for serialization.
-    """
-    queryset = Author.objects.all().prefetch_related(
-        Prefetch('books', queryset=Book.objects.all().prefetch_related(
-            Prefetch('author', queryset=Author.objects.all().only('title'))
-        ).only('id', 'title', 'price', 'slug', 'cover_image'))
-    )
+    Only the latest books of the author and their total number are embedded,
+    they are read as values() rows and serialized without instantiating models by BookListRowsSerializer.
+    The rest of the books are paged through AuthorBookListAPIView.
+    Conditional requests are validated against the modification time of the author
+    and the versions of books and authors.
+    """
+    queryset = Author.objects.all()
     serializer_class = AuthorDetailSerializer
+    authentication_classes = READ_ONLY_AUTHENTICATION_CLASSES
+    version_namespaces = ('book', 'author')
+    modification_field = 'updated_at'
 
 
 class ReviewCreateAPIView(CreateAPIView):
@@ -122,6 +331,39 @@ class ReviewCreateAPIView(CreateAPIView):
     This class-based view is used to handle the creation of new reviews.
     It utilizes the ReviewCreateSerializer for serializing the data provided in the request.
     The IsAuthenticated permission class is applied to ensure that only authenticated users can create reviews.
+    The review is inserted in the same transaction as the update of the rating aggregates of its book.
     """
     serializer_class = ReviewCreateSerializer
     permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        serializer.save()
+
+
+class CatalogueExportAPIView(APIView):
+    """
+    This staff-only endpoint streams the whole catalogue of books as a JSONL (default) or CSV file,
+    selected with the ?type= parameter.
+    Books are read through a server-side cursor chunk by chunk and every line is sent as soon as it is rendered,
+    so the memory use stays flat no matter how large the catalogue is.
+    """
+    permission_classes = [IsAdminUser]
+    content_types = {
+        'jsonl': 'application/x-ndjson; charset=utf-8',
+        'csv': 'text/csv; charset=utf-8',
+    }
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get('type', 'jsonl')
+        if file_format not in self.content_types:
+            raise ValidationError({'type': f'Підтримувані формати: {", ".join(self.content_types)}.'})
+
+        rows = iter_catalogue_rows(chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(
+            render_catalogue_rows(rows, file_format),
+            content_type=self.content_types[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="catalogue.{file_format}"'
+        return response
@@ -0,0 +1,183 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from readify.db.routers import read_database
+
+VERSION_KEY_PREFIX = 'store:version:'
+ENTRY_KEY_PREFIX = 'store:entry:'
+
+# every TaggedCache of the process, their statistics are exposed by readify.metrics
+tagged_caches = weakref.WeakSet()
+
+
+def _version_key(namespace):
+    return f'{VERSION_KEY_PREFIX}{namespace}'
+
+
+def get_versions(*namespaces):
+    """
+    Returns the current version stamps of the given namespaces from the shared cache.
+    A version stamp is the time of the last change in nanoseconds,
+    so a stamp lost together with an evicted cache key is always replaced by a newer one.
+    """
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    versions = cache.get_many(keys)
+
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+
+    return {namespace: versions[key] for key, namespace in keys.items()}
+
+
+def get_version(namespace):
+    return get_versions(namespace)[namespace]
+
+
+def bump_version(*namespaces):
+    """
+    Sets a new version stamp of the given namespaces once the current transaction is committed,
+    so data rendered from the not yet committed state is never stamped with the new version.
+    """
+    def bump():
+        version = time.time_ns()
+        cache.set_many({_version_key(namespace): version for namespace in namespaces}, timeout=None)
+
+    if namespaces:
+        transaction.on_commit(bump)
+
+
+def is_replicated(version):
+    """
+    Changes are assumed to reach the replicas within READ_YOUR_WRITES_SECONDS,
+    so when the current request reads from a replica, data depending on a newer version may be stale
+    and is neither cached nor validated with that version.
+    """
+    if read_database.get() is None:
+        return True
+    return version < time.time_ns() - settings.READ_YOUR_WRITES_SECONDS * 1_000_000_000
+
+
+class VersionedCache:
+    """
+    Two-level cache for rarely changing, expensive to render data.
+    Every entry is stamped with the version of its namespace at the moment it was rendered
+    and is kept both in the memory of the current process and in the shared cache.
+    An entry is served only while its stamp matches the current version of the namespace,
+    so calling bump_version(namespace) invalidates it in every process at once.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._entries = {}
+
+    def _entry_key(self, key):
+        return f'{ENTRY_KEY_PREFIX}{self.namespace}:{key}'
+
+    def get_or_set(self, key, render):
+        version = get_version(self.namespace)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        entry = cache.get(self._entry_key(key))
+        if entry is None or entry[0] != version:
+            entry = (version, render())
+            if not is_replicated(version):
+                return entry[1]
+            cache.set(self._entry_key(key), entry, timeout=None)
+
+        self._entries[key] = entry
+        return entry[1]
+
+    def clear(self):
+        """Clears the entries of the current process, the shared ones are left to their versions."""
+        self._entries.clear()
+
+
+class TaggedCache:
+    """
+    Process-local LRU cache of rendered responses, invalidated by tags.
+
+    Every entry is stored together with the versions of the tags it depends on
+    (for example "book:12" or "author:5"), and calling bump_version(tag) in any process
+    invalidates all entries tagged with it. The versions are read after the value is rendered,
+    and the value is not stored when any of them is newer than the start of rendering,
+    so a change made while rendering is never hidden behind a fresh version,
+    nor is a value read from a replica that may not have received the change yet, see is_replicated().
+    The number of entries is bounded by max_entries, the least recently used one is evicted first.
+    """
+
+    def __init__(self, name, max_entries=1024):
+        self.name = name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        tagged_caches.add(self)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            tag_versions, value = entry
+            if get_versions(*tag_versions) == tag_versions:
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self.hits += 1
+                return value
+
+            with self._lock:
+                self._entries.pop(key, None)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_or_set(self, key, render):
+        """
+        Returns the cached value of the key or renders it.
+        render() must return the value and the iterable of tags it depends on.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        started = time.time_ns()
+        value, tags = render()
+        tag_versions = get_versions(*tags)
+
+        if all(version < started and is_replicated(version) for version in tag_versions.values()):
+            with self._lock:
+                self._entries[key] = (tag_versions, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
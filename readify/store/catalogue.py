@@ -0,0 +1,332 @@
+import csv
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from slugify import slugify
+
+from django.db import transaction
+
+from store.cache import bump_version
+from store.models import Author, Book, Category, Language, Paper, Publisher
+from store.search import update_book_search_vectors
+from store.utils import get_category_tree_tags
+
+# the columns of a catalogue file, the multi-valued ones are separated by MULTI_VALUE_SEPARATOR in CSV
+# and may be either lists or separated strings in JSONL
+SCALAR_COLUMNS = ('title', 'isbn', 'price', 'category', 'cover_image', 'weight', 'edition', 'amount_pages')
+MULTI_VALUE_COLUMNS = ('author', 'publisher', 'paper', 'language')
+CATALOGUE_COLUMNS = SCALAR_COLUMNS + MULTI_VALUE_COLUMNS
+MULTI_VALUE_SEPARATOR = ';'
+
+RELATED_MODELS = {
+    'author': Author,
+    'publisher': Publisher,
+    'paper': Paper,
+    'language': Language,
+}
+
+
+def read_catalogue_rows(file, file_format):
+    """Lazily reads the rows of a CSV or JSONL catalogue file as dictionaries."""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+    elif file_format == 'jsonl':
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f'Unknown catalogue format: {file_format}')
+
+
+def iter_catalogue_rows(chunk_size=2000):
+    """
+    Yields the catalogue rows of all books ordered by id, in the same shape the importer reads.
+    Books are read through a server-side cursor chunk by chunk,
+    and the names of their authors, publishers, papers and languages are loaded
+    with one query per relation for every chunk, so the memory use doesn't depend on the catalogue size.
+    """
+    books = Book.objects.order_by('id').values_list(
+        'id', 'title', 'isbn', 'price', 'category__title', 'cover_image', 'weight', 'edition', 'amount_pages',
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(books, chunk_size))
+        if not chunk:
+            break
+
+        book_ids = [book[0] for book in chunk]
+        related_titles = {}
+        for column in MULTI_VALUE_COLUMNS:
+            titles = related_titles[column] = defaultdict(list)
+            through_rows = getattr(Book, column).through.objects.filter(
+                book_id__in=book_ids
+            ).order_by('id').values_list('book_id', f'{column}__title')
+            for book_id, title in through_rows:
+                titles[book_id].append(title)
+
+        for book_id, title, isbn, price, category, cover_image, weight, edition, amount_pages in chunk:
+            yield {
+                'id': book_id,
+                'title': title,
+                'isbn': isbn,
+                'price': str(price),
+                'category': category,
+                'cover_image': cover_image,
+                'weight': weight,
+                'edition': edition,
+                'amount_pages': amount_pages,
+                **{column: related_titles[column].get(book_id, []) for column in MULTI_VALUE_COLUMNS},
+            }
+
+
+class Echo:
+    """A file-like object that returns the written value instead of buffering it, for csv.writer."""
+
+    @staticmethod
+    def write(value):
+        return value
+
+
+def render_catalogue_rows(rows, file_format):
+    """Lazily renders catalogue rows as lines of a CSV or JSONL file."""
+    if file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+    elif file_format == 'csv':
+        columns = ('id',) + CATALOGUE_COLUMNS
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(
+                MULTI_VALUE_SEPARATOR.join(row[column]) if column in MULTI_VALUE_COLUMNS else row[column]
+                for column in columns
+            )
+    else:
+        raise ValueError(f'Unknown catalogue format: {file_format}')
+
+
+def split_values(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(MULTI_VALUE_SEPARATOR)
+    return list(dict.fromkeys(str(item).strip() for item in value if str(item).strip()))
+
+
+def parse_text(value):
+    """Returns the stripped text of a scalar value, the numbers of a JSONL row are read as their text."""
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        raise ValueError(f'expected a text value, got {value!r}')
+    return str(value).strip()
+
+
+def parse_positive_small_int(value):
+    if value in (None, ''):
+        return None
+    number = int(value)
+    if not 0 <= number <= 32767:
+        raise ValueError(f'{number} is out of range')
+    return number
+
+
+class CatalogueImporter:
+    """
+    This class imports books from a stream of catalogue rows in chunks.
+
+    Authors, publishers, papers, languages and categories are resolved through in-memory
+    title-to-id maps, and the missing ones are created in bulk once per chunk.
+    Books and the rows of their many-to-many tables are inserted with bulk_create,
+    and the search vectors of the whole chunk are calculated with a single UPDATE query.
+    Books whose ISBN already exists are skipped, so importing the same file twice is harmless,
+    and the unique ISBNs keep concurrent imports of the same file from duplicating books.
+    Every chunk is imported in its own transaction.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self._seen_isbns = set()
+        self._ids = {}
+        self._slugs = {}
+
+    def import_rows(self, rows):
+        """Imports the rows and yields the number of processed rows after every chunk."""
+        rows = iter(rows)
+        processed = 0
+
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+
+            self.import_chunk(chunk, first_row_number=processed + 1)
+            processed += len(chunk)
+            yield processed
+
+    def import_chunk(self, rows, first_row_number=1):
+        books = []
+        for row_number, row in enumerate(rows, start=first_row_number):
+            try:
+                book = self.parse_row(row)
+            except (ValueError, TypeError) as error:
+                self.errors.append((row_number, str(error)))
+                continue
+
+            if book is None:
+                self.skipped += 1
+            else:
+                books.append(book)
+
+        if not books:
+            return
+
+        with transaction.atomic():
+            existing_isbns = set(Book.objects.filter(
+                isbn__in=[book['isbn'] for book in books]
+            ).values_list('isbn', flat=True))
+            self.skipped += sum(book['isbn'] in existing_isbns for book in books)
+            books = [book for book in books if book['isbn'] not in existing_isbns]
+            if not books:
+                return
+
+            category_ids = self.resolve_categories({book['category'] for book in books if book['category']})
+            related_ids = {
+                column: self.resolve_titles(RELATED_MODELS[column], {
+                    title for book in books for title in book[column]
+                })
+                for column in MULTI_VALUE_COLUMNS
+            }
+
+            Book.objects.bulk_create((
+                Book(
+                    title=book['title'],
+                    slug=slugify(book['title']),
+                    isbn=book['isbn'],
+                    price=book['price'],
+                    category_id=category_ids.get(book['category']),
+                    cover_image=book['cover_image'],
+                    weight=book['weight'],
+                    edition=book['edition'],
+                    amount_pages=book['amount_pages'],
+                )
+                for book in books
+            ), ignore_conflicts=True)
+
+            # a concurrent import of the same books may have inserted some of them first,
+            # the unique ISBNs keep them from being duplicated and their relations are inserted once as well
+            book_ids = dict(Book.objects.filter(
+                isbn__in=[book['isbn'] for book in books]
+            ).values_list('isbn', 'id'))
+
+            for column in MULTI_VALUE_COLUMNS:
+                through = getattr(Book, column).through
+                through.objects.bulk_create((
+                    through(book_id=book_ids[book['isbn']], **{f'{column}_id': related_ids[column][title]})
+                    for book in books
+                    for title in book[column]
+                ), ignore_conflicts=True)
+
+            update_book_search_vectors(list(book_ids.values()))
+
+            # bulk inserts send no signals, so the cached lists are invalidated here,
+            # including the lists of the subtrees the categories of the books belong to
+            category_paths = Category.objects.filter(id__in=category_ids.values()).values_list('path', flat=True)
+            bump_version(
+                'book', 'book:*', 'search',
+                *(f'category:{category_id}' for category_id in category_ids.values()),
+                *get_category_tree_tags(category_paths),
+                *(f'{column}:{related_id}' for column in ('author', 'publisher', 'language')
+                  for related_id in related_ids[column].values()),
+            )
+
+        self.imported += len(books)
+
+    def parse_row(self, row):
+        """Returns the cleaned values of the row, or None for a duplicate ISBN within the import."""
+        if not isinstance(row, dict):
+            raise ValueError(f'expected an object, got {row!r}')
+        title = parse_text(row.get('title'))
+        isbn = parse_text(row.get('isbn'))
+        if not title:
+            raise ValueError('title is required')
+        if not isbn:
+            raise ValueError('isbn is required')
+
+        if isbn in self._seen_isbns:
+            return None
+        self._seen_isbns.add(isbn)
+
+        try:
+            price = Decimal(str(row.get('price') or '0')).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f'invalid price {row.get("price")!r}')
+        if not Decimal('0') <= price < Decimal('10000'):
+            raise ValueError(f'price {price} is out of range')
+
+        return {
+            'title': title[:255],
+            'isbn': isbn[:255],
+            'price': price,
+            'category': parse_text(row.get('category'))[:255],
+            'cover_image': parse_text(row.get('cover_image')),
+            'weight': parse_positive_small_int(row.get('weight')),
+            'edition': parse_positive_small_int(row.get('edition')),
+            'amount_pages': parse_positive_small_int(row.get('amount_pages')),
+            **{column: [value[:255] for value in split_values(row.get(column))] for column in MULTI_VALUE_COLUMNS},
+        }
+
+    def get_ids(self, model):
+        if model not in self._ids:
+            self._ids[model] = dict(model.objects.values_list('title', 'id'))
+        return self._ids[model]
+
+    def get_unique_slug(self, model, title):
+        if model not in self._slugs:
+            self._slugs[model] = set(model.objects.values_list('slug', flat=True))
+
+        base_slug = slugify(title)[:240] or 'item'
+        slug, number = base_slug, 1
+        while slug in self._slugs[model]:
+            number += 1
+            slug = f'{base_slug}-{number}'
+
+        self._slugs[model].add(slug)
+        return slug
+
+    def resolve_titles(self, model, titles):
+        """Returns the ids of the objects with the given titles, creating the missing ones in bulk."""
+        ids = self.get_ids(model)
+        missing = sorted(titles - ids.keys())
+
+        if missing:
+            if model in (Author, Publisher):
+                created = model.objects.bulk_create(
+                    model(title=title, slug=self.get_unique_slug(model, title)) for title in missing
+                )
+                ids.update((obj.title, obj.id) for obj in created)
+            else:
+                model.objects.bulk_create((model(title=title) for title in missing), ignore_conflicts=True)
+                ids.update(model.objects.filter(title__in=missing).values_list('title', 'id'))
+
+        return {title: ids[title] for title in titles}
+
+    def resolve_categories(self, titles):
+        """
+        Returns the ids of the categories with the given titles.
+        The missing categories are few, so they are created one by one as root categories
+        to keep their materialized paths.
+        """
+        ids = self.get_ids(Category)
+
+        for title in sorted(titles - ids.keys()):
+            category = Category(title=title, slug=self.get_unique_slug(Category, title))
+            category.save()
+            ids[title] = category.id
+
+        return {title: ids[title] for title in titles}
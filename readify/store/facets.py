@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Floor
+
+from store.models import Book
+
+FACET_RELATIONS = ('category', 'author', 'publisher', 'language')
+PRICE_FACET = 'price'
+FACETS = (*FACET_RELATIONS, PRICE_FACET)
+# the filter parameters every facet ignores, so its counts show what selecting another value would give
+FACET_FILTER_PARAMS = {
+    **{relation: (relation,) for relation in FACET_RELATIONS},
+    'category': ('category', 'category_tree'),
+    PRICE_FACET: ('min_price', 'max_price'),
+}
+# only the most frequent values of a facet are counted
+FACET_LIMIT = 50
+PRICE_STEP = Decimal(100)
+PRICE_PRECISION = Decimal('0.01')
+
+
+def get_facet_rows(facet, books):
+    """
+    Returns the grouped query of the values of the facet with their titles and numbers of books
+    as (facet, value, title, count) rows, the most frequent values first.
+    The price facet is a histogram of price ranges of PRICE_STEP, the cheapest first.
+    """
+    book_ids = books.order_by().values('id')
+
+    if facet == PRICE_FACET:
+        price_field = Book._meta.get_field('price')
+        rows = Book.objects.filter(id__in=book_ids).annotate(
+            facet=Value(facet, output_field=CharField()),
+            facet_value=Floor(F('price') / PRICE_STEP, output_field=price_field) * PRICE_STEP,
+            facet_title=Value(None, output_field=CharField()),
+        )
+        ordering = ('facet_value',)
+    elif facet == 'category':
+        rows = Book.objects.filter(id__in=book_ids, category__isnull=False).annotate(
+            facet=Value(facet, output_field=CharField()),
+            facet_value=F('category_id'),
+            facet_title=F('category__title'),
+        )
+        ordering = ('-facet_count', 'facet_value')
+    else:
+        rows = getattr(Book, facet).through.objects.filter(book_id__in=book_ids).annotate(
+            facet=Value(facet, output_field=CharField()),
+            facet_value=F(f'{facet}_id'),
+            facet_title=F(f'{facet}__title'),
+        )
+        ordering = ('-facet_count', 'facet_value')
+
+    rows = rows.values_list('facet', 'facet_value', 'facet_title').annotate(facet_count=Count('*'))
+    rows = rows.order_by(*ordering)
+    return rows if facet == PRICE_FACET else rows[:FACET_LIMIT]
+
+
+def count_facets(facet_books):
+    """
+    Counts the books of every facet of the facet_books mapping of facet names to the books it is counted for
+    with a single UNION ALL of grouped queries, and returns the counts of every facet:
+    {"id", "title", "count"} for the related objects and {"min", "max", "count"} for the price ranges.
+    """
+    facets = {facet: [] for facet in facet_books}
+    if not facets:
+        return facets
+
+    first, *rest = (get_facet_rows(facet, books) for facet, books in facet_books.items())
+
+    # the ids and the prices come back as numeric values of the united column
+    for facet, value, title, count in first.union(*rest, all=True):
+        if facet == PRICE_FACET:
+            value = Decimal(value).quantize(PRICE_PRECISION)
+            facets[facet].append({'min': str(value), 'max': str(value + PRICE_STEP), 'count': count})
+        else:
+            facets[facet].append({'id': int(value), 'title': title, 'count': count})
+
+    # the order of the united rows isn't guaranteed
+    for facet, values in facets.items():
+        if facet == PRICE_FACET:
+            values.sort(key=lambda price_range: Decimal(price_range['min']))
+        else:
+            values.sort(key=lambda item: (-item['count'], item['id']))
+
+    return facets
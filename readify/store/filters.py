@@ -1,12 +1,56 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
 
 from .models import Book
+from .search import SEARCH_CONFIG
+from .utils import get_category_subtree_ids
 
 
 class BookListFilter(filters.FilterSet):
     min_price = filters.NumberFilter(field_name='price', lookup_expr='gte')
     max_price = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    min_rating = filters.NumberFilter(field_name='average_rating', lookup_expr='gte')
+    category_tree = filters.NumberFilter(method='filter_category_tree', label='Категорія разом із підкатегоріями')
 
     class Meta:
         model = Book
         fields = ('category', 'author', 'publisher', 'language')
+
+    @staticmethod
+    def filter_category_tree(queryset, name, value):
+        # the books of any subcategory are matched by the indexed category id of the book
+        return queryset.filter(category_id__in=get_category_subtree_ids(int(value)))
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    This filter backend handles the ?search= parameter with PostgreSQL full-text search.
+    Books are matched against the indexed search vector (title, authors and publishers)
+    and ordered by relevance. When nothing matches, for example because of a typo,
+    the view sets its search_fallback attribute and books are looked up instead by the trigram similarity
+    of their title with the % operator, which is served by the trigram index of the title
+    and matches a similarity of at least pg_trgm.similarity_threshold, 0.3 by default.
+    The view decides on the fallback from the empty first page, so a search that matches costs no extra query.
+    Both cases annotate the queryset with search_rank, cast to double precision
+    so that its value survives the round trip through a pagination cursor exactly.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+
+        search_text = ' '.join(search_terms)
+        if getattr(view, 'search_fallback', False):
+            return queryset.filter(title__trigram_similar=search_text).annotate(
+                search_rank=Cast(TrigramSimilarity('title', search_text), FloatField())
+            ).order_by('-search_rank', 'id')
+
+        search_query = SearchQuery(search_text, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+        ).order_by('-search_rank', 'id')
@@ -0,0 +1,231 @@
+import csv
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import islice
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from store.cache import bump_version
+from store.models import Author, Book, Category, Language, Paper, Publisher, Review
+from store.ratings import RATING_COUNT_FIELDS
+from store.search import update_book_search_vectors
+from users.models import User
+
+TITLE_WORDS = (
+    'тінь', 'вітер', 'місто', 'море', 'ніч', 'сад', 'дорога', 'зима', 'серце', 'пам\'ять',
+    'острів', 'ліс', 'світло', 'таємниця', 'час', 'дім', 'річка', 'небо', 'листя', 'вогонь',
+    'shadow', 'wind', 'city', 'garden', 'river', 'winter', 'light', 'secret', 'house', 'sky',
+)
+NAMES = ('Олена', 'Андрій', 'Марія', 'Тарас', 'Ірина', 'Богдан', 'Софія', 'Максим', 'Anna', 'John')
+SURNAMES = ('Коваль', 'Шевченко', 'Мельник', 'Бондар', 'Ткаченко', 'Кравець', 'Лисенко', 'Smith', 'Brown', 'Green')
+LANGUAGES = ('Українська', 'English', 'Polski', 'Deutsch', 'Français')
+PAPERS = ('Офсетний', 'Газетний', 'Крейдований')
+# reviews are spread over this number of days before today
+REVIEW_DAYS = 3 * 365
+
+
+def copy_rows(model, columns, rows):
+    """
+    Inserts the rows into the table of the model with a single COPY statement,
+    which is several times faster than bulk_create for the millions of rows
+    of the many-to-many tables and reviews, as no model instances are created.
+    """
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_list = ', '.join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(f'COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+class CatalogueGenerator:
+    """
+    This class fills the database with a synthetic catalogue of a configurable size for benchmarks
+    and query plan checks: a category tree of the given depth, authors, publishers, users,
+    books with their many-to-many relations, and reviews.
+
+    Everything is inserted in chunks, books with bulk_create and the rows of the many-to-many tables
+    and reviews with COPY, the materialized paths of the categories
+    are calculated from the ids of their parents level by level, and the rating aggregates
+    of the books are calculated in memory together with their reviews,
+    so no signal or per-row query is involved. The search vectors are updated once per chunk.
+    The random generator is seeded, so the same options produce the same catalogue.
+    """
+
+    def __init__(self, books=1000, authors=200, publishers=50, category_depth=3, category_children=4,
+                 reviews_per_book=5, users=100, chunk_size=2000, seed=0):
+        self.books = books
+        self.authors = authors
+        self.publishers = publishers
+        self.category_depth = category_depth
+        self.category_children = category_children
+        self.reviews_per_book = reviews_per_book
+        self.users = users
+        self.chunk_size = chunk_size
+        self.random = random.Random(seed)
+        # slugs, emails and phone numbers are unique, so every run gets its own prefix
+        self.prefix = uuid4().hex[:8]
+
+    def generate(self):
+        """Generates the catalogue and yields the name and the number of objects after every step."""
+        language_ids = self.create_titled(Language, LANGUAGES)
+        paper_ids = self.create_titled(Paper, PAPERS)
+        category_ids = self.create_categories()
+        yield 'categories', len(category_ids)
+
+        author_ids = self.create_people(Author, self.authors)
+        yield 'authors', len(author_ids)
+        publisher_ids = self.create_people(Publisher, self.publishers)
+        yield 'publishers', len(publisher_ids)
+        user_ids = self.create_users()
+        yield 'users', len(user_ids)
+
+        related_ids = {'author': author_ids, 'publisher': publisher_ids, 'language': language_ids, 'paper': paper_ids}
+        created_books = created_reviews = 0
+        for number in range(0, self.books, self.chunk_size):
+            amount = min(self.chunk_size, self.books - number)
+            book_count, review_count = self.create_books(number, amount, category_ids, related_ids, user_ids)
+            created_books += book_count
+            created_reviews += review_count
+            yield 'books', created_books
+            yield 'reviews', created_reviews
+
+        # bulk inserts send no signals, so all the cached data is invalidated here
+        bump_version(
+            'category', 'book', 'author', 'publisher', 'paper', 'language', 'review',
+            'book:*', 'search', 'rating',
+        )
+
+    @staticmethod
+    def create_titled(model, titles):
+        model.objects.bulk_create((model(title=title) for title in titles), ignore_conflicts=True)
+        return list(model.objects.filter(title__in=titles).values_list('id', flat=True))
+
+    def create_categories(self):
+        """Creates the category tree level by level and returns the ids of all the categories."""
+        category_ids = []
+        parents = [None]
+
+        for depth in range(self.category_depth):
+            categories = Category.objects.bulk_create(
+                Category(
+                    title=f'Категорія {depth + 1}.{index + 1}',
+                    slug=f'{self.prefix}-category-{depth}-{index}',
+                    parent=parent,
+                )
+                for index, parent in enumerate(
+                    parent for parent in parents for _ in range(self.category_children)
+                )
+            )
+            for category in categories:
+                parent_path = category.parent.path if category.parent is not None else ''
+                category.path = f'{parent_path}{category.pk:0{Category.PATH_SEGMENT_LENGTH}d}{Category.PATH_SEPARATOR}'
+                category.depth = depth
+            Category.objects.bulk_update(categories, ('path', 'depth'), batch_size=self.chunk_size)
+
+            category_ids.extend(category.pk for category in categories)
+            parents = categories
+
+        return category_ids
+
+    def create_people(self, model, amount):
+        ids = []
+        for number in range(0, amount, self.chunk_size):
+            objects = model.objects.bulk_create(
+                model(
+                    title=f'{self.random.choice(NAMES)} {self.random.choice(SURNAMES)} {index}',
+                    slug=f'{self.prefix}-{model._meta.model_name}-{index}',
+                )
+                for index in range(number, min(number + self.chunk_size, amount))
+            )
+            ids.extend(obj.pk for obj in objects)
+        return ids
+
+    def create_users(self):
+        password = make_password(None)
+        users = iter(
+            User(
+                email=f'{self.prefix}-user-{index}@example.com',
+                phone_number=f'0{int(self.prefix, 16) % 10 ** 5:05d}{index:04d}'[:10],
+                first_name=self.random.choice(NAMES),
+                last_name=self.random.choice(SURNAMES),
+                password=password,
+                is_active=True,
+            )
+            for index in range(min(self.users, 10 ** 4))
+        )
+
+        ids = []
+        while True:
+            chunk = list(islice(users, self.chunk_size))
+            if not chunk:
+                break
+            ids.extend(user.pk for user in User.objects.bulk_create(chunk))
+        return ids
+
+    def create_books(self, first_number, amount, category_ids, related_ids, user_ids):
+        """Creates a chunk of books with their relations and reviews in one transaction."""
+        books, reviews = [], []
+
+        for number in range(first_number, first_number + amount):
+            title = ' '.join(self.random.choices(TITLE_WORDS, k=self.random.randint(2, 4))).capitalize()
+            book = Book(
+                title=f'{title} {number}',
+                slug=f'{self.prefix}-book-{number}',
+                isbn=f'{self.prefix}-{number:09d}',
+                price=Decimal(self.random.randint(5000, 250000)) / 100,
+                category_id=self.random.choice(category_ids) if category_ids else None,
+                cover_image=f'book_covers/generated-{number % 100}.jpg',
+                weight=self.random.randint(150, 1200),
+                edition=self.random.choice((1000, 2000, 5000, 10000)),
+                amount_pages=self.random.randint(64, 900),
+            )
+
+            book_reviews = self.random.randint(0, 2 * self.reviews_per_book) if user_ids else 0
+            ratings = [self.random.choices((1, 2, 3, 4, 5), weights=(1, 2, 4, 6, 5))[0] for _ in range(book_reviews)]
+            book.review_count = len(ratings)
+            book.rating_sum = sum(ratings)
+            book.average_rating = book.rating_sum / book.review_count if ratings else 0.0
+            for rating, field in RATING_COUNT_FIELDS.items():
+                setattr(book, field, ratings.count(rating))
+
+            books.append(book)
+            reviews.append(ratings)
+
+        with transaction.atomic():
+            books = Book.objects.bulk_create(books)
+
+            relation_sizes = {'author': (1, 3), 'publisher': (1, 2), 'language': (1, 2), 'paper': (1, 1)}
+            for relation, (minimum, maximum) in relation_sizes.items():
+                ids = related_ids[relation]
+                if not ids:
+                    continue
+                copy_rows(getattr(Book, relation).through, ('book_id', f'{relation}_id'), (
+                    (book.pk, related_id)
+                    for book in books
+                    for related_id in set(self.random.choices(ids, k=self.random.randint(minimum, maximum)))
+                ))
+
+            today = date.today()
+            copy_rows(Review, ('book_id', 'user_id', 'title', 'content', 'rating', 'created'), (
+                (
+                    book.pk,
+                    self.random.choice(user_ids),
+                    f'Рецензія {index + 1}',
+                    ' '.join(self.random.choices(TITLE_WORDS, k=20)),
+                    rating,
+                    today - timedelta(days=self.random.randint(0, REVIEW_DAYS)),
+                )
+                for book, ratings in zip(books, reviews)
+                for index, rating in enumerate(ratings)
+            ))
+
+            update_book_search_vectors([book.pk for book in books])
+
+        return len(books), sum(map(len, reviews))
@@ -0,0 +1,193 @@
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models.functions import Now
+
+from store.cache import bump_version
+from store.models import Author, Book, Publisher
+
+logger = logging.getLogger(__name__)
+
+# the variants generated from every uploaded image, the size is the box the image is fitted into
+IMAGE_VARIANTS = {
+    'thumbnail': {'size': (200, 300), 'format': 'JPEG'},
+    'thumbnail_webp': {'size': (200, 300), 'format': 'WEBP'},
+    'webp': {'size': (1200, 1800), 'format': 'WEBP'},
+}
+VARIANT_EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+VARIANT_QUALITY = 85
+VARIANTS_DIRECTORY = 'variants'
+
+# the image field and the field with the generated variants of every model with images
+IMAGE_FIELDS = {
+    Book: ('cover_image', 'cover_variants'),
+    Author: ('image', 'image_variants'),
+    Publisher: ('image', 'image_variants'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix='image-variants',
+            )
+        return _executor
+
+
+def render_variant(image, size, image_format):
+    """Returns the image fitted into the size and encoded in the format together with its dimensions."""
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGBA')
+        background = Image.new('RGB', variant.size, (255, 255, 255))
+        background.paste(variant, mask=variant.getchannel('A'))
+        variant = background
+
+    content = BytesIO()
+    variant.save(content, image_format, quality=VARIANT_QUALITY, optimize=image_format == 'JPEG')
+    return content.getvalue(), variant.size
+
+
+def generate_variants(storage, name, directory):
+    """
+    Generates all the variants of the stored image with the given name in the directory
+    and returns their names and dimensions together with the name of the source image.
+    """
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    variants = {'source': name}
+
+    with storage.open(name, 'rb') as file:
+        with Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+            for variant, options in IMAGE_VARIANTS.items():
+                content, (width, height) = render_variant(image, options['size'], options['format'])
+                variant_name = posixpath.join(
+                    directory, VARIANTS_DIRECTORY,
+                    f'{stem}-{variant}.{VARIANT_EXTENSIONS[options["format"]]}',
+                )
+                variants[variant] = {
+                    'name': storage.save(variant_name, ContentFile(content)),
+                    'width': width,
+                    'height': height,
+                }
+
+    return variants
+
+
+def delete_variants(model, variants):
+    """
+    Deletes the files of the variants that no object of the model refers to,
+    identical images share their variants in the content-addressed storage.
+    """
+    image_field, variants_field = IMAGE_FIELDS[model]
+    storage = model._meta.get_field(image_field).storage
+
+    for variant in IMAGE_VARIANTS:
+        if variant not in variants:
+            continue
+        name = variants[variant]['name']
+        if not model.objects.filter(**{f'{variants_field}__{variant}__name': name}).exists():
+            storage.delete(name)
+
+
+def update_image_variants(model, pk, force=False):
+    """
+    Generates the variants of the current image of the object and stores them in its variants field,
+    unless they are already generated from it or force is set.
+    The variants of the previous image are deleted. Nothing is stored when the image was changed meanwhile,
+    the change schedules its own update.
+    """
+    image_field, variants_field = IMAGE_FIELDS[model]
+    field = model._meta.get_field(image_field)
+
+    row = model.objects.filter(pk=pk).values(image_field, variants_field).first()
+    if row is None:
+        return
+    name, old_variants = row[image_field], row[variants_field]
+    if old_variants.get('source', '') == name and not force:
+        return
+
+    variants = generate_variants(field.storage, name, field.upload_to) if name else {}
+
+    updated = model.objects.filter(pk=pk, **{image_field: name}).update(**{
+        variants_field: variants,
+        'updated_at': Now(),
+    })
+    if not updated:
+        delete_variants(model, variants)
+        return
+
+    delete_variants(model, old_variants)
+
+    # update() sends no signals, so the cached data showing the image is invalidated here
+    namespace = model._meta.model_name
+    if model is Book:
+        bump_version(namespace, f'book:{pk}')
+    else:
+        bump_version(namespace)
+
+
+def run_image_variants_update(model, pk):
+    try:
+        update_image_variants(model, pk)
+    except Exception:
+        logger.exception('Failed to generate the image variants of %s %s', model._meta.label, pk)
+    finally:
+        # the worker threads open their own database connections
+        connections.close_all()
+
+
+def schedule_image_variants(instance):
+    """
+    Generates the variants of the image of the object in the worker pool
+    once the current transaction is committed, if the image has changed.
+    """
+    image_field, variants_field = IMAGE_FIELDS[type(instance)]
+    name = getattr(instance, image_field).name or ''
+    variants = getattr(instance, variants_field) or {}
+
+    if variants.get('source', '') == name:
+        return
+
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: get_executor().submit(run_image_variants_update, model, pk))
+
+
+def get_thumbnail_data(variants, storage, request=None):
+    """
+    Returns the URLs of the JPEG and WebP thumbnails together with their dimensions,
+    or None if the thumbnails haven't been generated yet.
+    """
+    if not variants or 'thumbnail' not in variants:
+        return None
+
+    urls = {}
+    for key, variant in (('url', 'thumbnail'), ('webp_url', 'thumbnail_webp')):
+        url = storage.url(variants[variant]['name'])
+        urls[key] = request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        **urls,
+        'width': variants['thumbnail']['width'],
+        'height': variants['thumbnail']['height'],
+    }
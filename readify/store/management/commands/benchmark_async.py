@@ -0,0 +1,161 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from statistics import mean
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from store.api.async_views import shutdown_database_executor
+from store.models import Book
+from store.scenarios import (
+    get_async_url,
+    get_endpoint_scenarios,
+    get_scenario_params,
+    get_second_page_cursor,
+    percentile,
+)
+
+
+def summarize(timings, elapsed, statuses):
+    return {
+        'requests': len(timings),
+        'mean_ms': round(mean(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(max(timings), 3),
+        'throughput_rps': round(len(timings) / elapsed, 2),
+        'statuses': statuses,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends the same concurrent load to the synchronous store endpoints served by a WSGI worker '
+        'with a fixed number of threads and to their asynchronous versions served under ASGI '
+        'with the same number of database threads, and reports the p50/p95/p99 latency and the throughput of both.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Number of measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=10, help='Number of unmeasured requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=32, help='Number of clients sending requests at once.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.ASYNC_DATABASE_WORKERS,
+            help='Number of threads of the WSGI worker and of database threads under ASGI.',
+        )
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Run only this scenario.')
+        parser.add_argument('--output', help='Path to the JSON file with the results.')
+
+    def handle(self, *args, **options):
+        if not Book.objects.exists():
+            raise CommandError('The catalogue is empty, fill it with the generate_catalogue command first.')
+
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('silk.')]
+        with override_settings(
+            MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS],
+            ASYNC_DATABASE_WORKERS=options['workers'],
+        ):
+            scenarios = [
+                (scenario, async_url) for scenario in get_endpoint_scenarios()
+                if (async_url := get_async_url(scenario.url)) is not None
+            ]
+            if options['scenarios']:
+                scenarios = [(scenario, url) for scenario, url in scenarios if scenario.name in options['scenarios']]
+            next_cursor = get_second_page_cursor()
+
+            # the database threads are started again with the number of workers
+            shutdown_database_executor()
+            results = []
+            try:
+                for scenario, async_url in scenarios:
+                    params = get_scenario_params(scenario, next_cursor)
+                    wsgi = self.benchmark_wsgi(scenario.url, params, options)
+                    asgi = asyncio.run(self.benchmark_asgi(async_url, params, options))
+                    results.append({'name': scenario.name, 'url': scenario.url, 'async_url': async_url,
+                                    'params': scenario.params, 'wsgi': wsgi, 'asgi': asgi})
+                    for server, result in (('WSGI', wsgi), ('ASGI', asgi)):
+                        self.stdout.write(
+                            f'{scenario.name:32} {server}  p50 {result["p50_ms"]:8.2f} ms  '
+                            f'p95 {result["p95_ms"]:8.2f} ms  p99 {result["p99_ms"]:8.2f} ms  '
+                            f'{result["throughput_rps"]:8.1f} req/s'
+                        )
+            finally:
+                shutdown_database_executor()
+
+        if options['output']:
+            options_report = {name: options[name] for name in ('requests', 'warmup', 'concurrency', 'workers')}
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({'options': options_report, 'results': results}, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Saved the results to {options["output"]}'))
+
+    @staticmethod
+    def benchmark_wsgi(url, params, options):
+        """
+        The clients wait for a free thread of the worker like the requests queued by a threaded WSGI server,
+        so the latency includes the time spent in the queue.
+        """
+        local = threading.local()
+
+        def send():
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            return local.client.get(url, params).status_code
+
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='wsgi') as worker:
+            def run_client(count):
+                timings, statuses = [], {}
+                for _ in range(count):
+                    started = perf_counter()
+                    status = worker.submit(send).result()
+                    timings.append((perf_counter() - started) * 1000)
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+                return timings, statuses
+
+            run_client(options['warmup'])
+            concurrency = max(options['concurrency'], 1)
+            shares = [options['requests'] // concurrency + (index < options['requests'] % concurrency)
+                      for index in range(concurrency)]
+            started = perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as clients:
+                outcomes = list(clients.map(run_client, shares))
+            elapsed = perf_counter() - started
+
+            for _ in range(options['workers']):
+                worker.submit(connections.close_all)
+
+        timings = [timing for outcome in outcomes for timing in outcome[0]]
+        statuses = {}
+        for outcome in outcomes:
+            for status, count in outcome[1].items():
+                statuses[status] = statuses.get(status, 0) + count
+        return summarize(timings, elapsed, statuses)
+
+    @staticmethod
+    async def benchmark_asgi(url, params, options):
+        client = AsyncClient()
+        timings, statuses = [], {}
+
+        async def run_client(count, measured=True):
+            for _ in range(count):
+                started = perf_counter()
+                response = await client.get(url, params)
+                if measured:
+                    timings.append((perf_counter() - started) * 1000)
+                    statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+        await run_client(options['warmup'], measured=False)
+        concurrency = max(options['concurrency'], 1)
+        started = perf_counter()
+        await asyncio.gather(*(
+            run_client(options['requests'] // concurrency + (index < options['requests'] % concurrency))
+            for index in range(concurrency)
+        ))
+        elapsed = perf_counter() - started
+        return summarize(timings, elapsed, statuses)
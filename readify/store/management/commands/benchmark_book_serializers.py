@@ -0,0 +1,86 @@
+from statistics import mean
+from time import perf_counter
+
+from rest_framework.test import APIRequestFactory
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+
+from store.api.serializers import BookListSerializer, BookListRowsSerializer
+from store.models import Author, Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the speed of BookListSerializer with the model-free BookListRowsSerializer '
+        'on a temporary set of books that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=5000, help='Number of temporary books.')
+        parser.add_argument('--authors-per-book', type=int, default=2, help='Number of authors of every book.')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of measured runs of every path.')
+
+    def handle(self, *args, **options):
+        context = {'request': APIRequestFactory().get('/api/book/list/')}
+
+        with transaction.atomic():
+            book_ids = self.create_books(options['books'], options['authors_per_book'])
+            books = Book.objects.filter(id__in=book_ids).order_by('id')
+
+            def serialize_models():
+                queryset = books.prefetch_related(
+                    Prefetch('author', queryset=Author.objects.all().only('id', 'title')),
+                ).only(*BookListRowsSerializer.fields)
+                return BookListSerializer(queryset, many=True, context=context).data
+
+            def serialize_rows():
+                rows = books.values(*BookListRowsSerializer.fields)
+                return BookListRowsSerializer(rows, context=context).data
+
+            if [dict(item) for item in serialize_models()] != serialize_rows():
+                raise CommandError('BookListRowsSerializer output differs from BookListSerializer output.')
+
+            model_timings = self.measure(serialize_models, options['repeat'])
+            rows_timings = self.measure(serialize_rows, options['repeat'])
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Books: {options["books"]}, authors per book: {options["authors_per_book"]}')
+        self.stdout.write(f'BookListSerializer:     mean {mean(model_timings):.1f} ms, best {min(model_timings):.1f} ms')
+        self.stdout.write(f'BookListRowsSerializer: mean {mean(rows_timings):.1f} ms, best {min(rows_timings):.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {mean(model_timings) / mean(rows_timings):.1f}x'))
+
+    @staticmethod
+    def create_books(amount, authors_per_book):
+        authors = Author.objects.bulk_create(
+            Author(title=f'Benchmark author {number}', slug=f'benchmark-author-{number}')
+            for number in range(max(amount // 10, authors_per_book))
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=f'Benchmark book {number}',
+                slug=f'benchmark-book-{number}',
+                price=100 + number % 900,
+                cover_image=f'book_covers/benchmark-{number}.jpg',
+            )
+            for number in range(amount)
+        )
+        Book.author.through.objects.bulk_create(
+            Book.author.through(book_id=book.id, author_id=authors[(index + shift) % len(authors)].id)
+            for index, book in enumerate(books)
+            for shift in range(authors_per_book)
+        )
+        return [book.id for book in books]
+
+    @staticmethod
+    def measure(function, repeat):
+        timings = []
+
+        for _ in range(repeat):
+            started = perf_counter()
+            function()
+            timings.append((perf_counter() - started) * 1000)
+
+        return timings
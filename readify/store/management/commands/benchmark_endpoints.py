@@ -0,0 +1,169 @@
+import json
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from statistics import mean
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from store.models import Author, Book, Category, Publisher, Review
+from store.scenarios import (
+    clear_caches,
+    get_endpoint_scenarios,
+    get_scenario_client,
+    get_second_page_cursor,
+    percentile,
+    request_scenario,
+)
+from users.models import User
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'), cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends a number of requests to every store endpoint against the data in the database '
+        'and reports the p50/p95/p99 latency, the number of queries per request and the throughput of each, '
+        'optionally saving the results as JSON and comparing them with the results of a previous run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Number of measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=5, help='Number of unmeasured requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of threads sending requests.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Clear the response caches before every request, this clears the whole default cache.',
+        )
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Run only this scenario.')
+        parser.add_argument('--staff-email', help='Email of a staff user to benchmark the catalogue export.')
+        parser.add_argument('--output', help='Path to the JSON file with the results.')
+        parser.add_argument('--compare', help='Path to the JSON file with the results of a previous run.')
+
+    def handle(self, *args, **options):
+        if not Book.objects.exists():
+            raise CommandError('The catalogue is empty, fill it with the generate_catalogue command first.')
+
+        staff = None
+        if options['staff_email']:
+            staff = User.objects.filter(email=options['staff_email'], is_staff=True).first()
+            if staff is None:
+                raise CommandError(f'There is no staff user {options["staff_email"]}.')
+
+        # the profiler middleware stores its own records with additional queries
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('silk.')]
+        with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver', *settings.ALLOWED_HOSTS]):
+            scenarios = get_endpoint_scenarios(staff=staff)
+            if options['scenarios']:
+                scenarios = [scenario for scenario in scenarios if scenario.name in options['scenarios']]
+            next_cursor = get_second_page_cursor()
+
+            results = []
+            for scenario in scenarios:
+                result = self.benchmark(scenario, next_cursor, options)
+                results.append(result)
+                self.stdout.write(
+                    f'{scenario.name:32} p50 {result["p50_ms"]:8.2f} ms  p95 {result["p95_ms"]:8.2f} ms  '
+                    f'p99 {result["p99_ms"]:8.2f} ms  {result["queries_per_request"]:5.1f} queries  '
+                    f'{result["throughput_rps"]:8.1f} req/s'
+                )
+
+        report = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'commit': get_git_commit(),
+            'python': platform.python_version(),
+            'options': {name: options[name] for name in ('requests', 'warmup', 'concurrency', 'cold')},
+            'catalogue': {
+                model._meta.model_name: model.objects.count()
+                for model in (Category, Book, Author, Publisher, Review)
+            },
+            'results': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Saved the results to {options["output"]}'))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                self.compare(json.load(file), report)
+
+    def benchmark(self, scenario, next_cursor, options):
+        def send(count):
+            client = get_scenario_client(scenario)
+            timings, query_counts, statuses = [], [], {}
+            try:
+                for _ in range(count):
+                    if options['cold']:
+                        clear_caches()
+                    with CaptureQueriesContext(connection) as context:
+                        started = perf_counter()
+                        response = request_scenario(client, scenario, next_cursor)
+                        timings.append((perf_counter() - started) * 1000)
+                    query_counts.append(len(context.captured_queries))
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            finally:
+                connections.close_all()
+            return timings, query_counts, statuses
+
+        send(options['warmup'])
+
+        concurrency = max(options['concurrency'], 1)
+        shares = [options['requests'] // concurrency + (index < options['requests'] % concurrency)
+                  for index in range(concurrency)]
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(send, shares))
+        elapsed = perf_counter() - started
+
+        timings = [timing for outcome in outcomes for timing in outcome[0]]
+        query_counts = [count for outcome in outcomes for count in outcome[1]]
+        statuses = {}
+        for outcome in outcomes:
+            for status, count in outcome[2].items():
+                statuses[str(status)] = statuses.get(str(status), 0) + count
+
+        return {
+            'name': scenario.name,
+            'method': scenario.method.upper(),
+            'url': scenario.url,
+            'params': scenario.params,
+            'requests': len(timings),
+            'mean_ms': round(mean(timings), 3),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'max_ms': round(max(timings), 3),
+            'queries_per_request': round(mean(query_counts), 2),
+            'throughput_rps': round(len(timings) / elapsed, 2),
+            'statuses': statuses,
+        }
+
+    def compare(self, previous, current):
+        self.stdout.write(f'Compared with {previous.get("commit") or "the previous run"} ({previous["created"]}):')
+        previous_results = {result['name']: result for result in previous['results']}
+
+        for result in current['results']:
+            before = previous_results.get(result['name'])
+            if before is None:
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+            self.stdout.write(style(
+                f'{result["name"]:32} p95 {before["p95_ms"]:8.2f} -> {result["p95_ms"]:8.2f} ms ({change:+.1f}%)  '
+                f'queries {before["queries_per_request"]:.1f} -> {result["queries_per_request"]:.1f}'
+            ))
@@ -0,0 +1,91 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from store.models import Book
+from store.scenarios import (
+    QueryPlanChecker,
+    clear_caches,
+    explain,
+    get_captured_sql,
+    get_endpoint_scenarios,
+    get_scenario_client,
+    get_scenario_users,
+    get_second_page_cursor,
+    request_scenario,
+    seed_catalogue,
+)
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'query-plans'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates a test database with a synthetic catalogue of a chosen size, requests every store endpoint '
+        'with representative filters, searches and orderings, and explains every captured query '
+        'with sequential scans, hash joins and merge joins disabled. '
+        'Fails when a query still has to read a whole table or an endpoint makes more queries than its budget allows. '
+        'The same checks run in the test suite, see store.tests.test_query_plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=5000, help='Number of generated books.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs.')
+        parser.add_argument('--show-plans', action='store_true', help='Print the plan of every query.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'],
+        )
+
+        try:
+            # the profiler middleware stores its own records with additional queries
+            middleware = [name for name in settings.MIDDLEWARE if not name.startswith('silk.')]
+            with override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'], MIDDLEWARE=middleware):
+                if not Book.objects.exists():
+                    for step, amount in seed_catalogue(options['books']):
+                        self.stdout.write(f'Generated {amount} {step}')
+                staff, reviewer = get_scenario_users()
+                failures = self.check_scenarios(
+                    get_endpoint_scenarios(staff=staff, reviewer=reviewer), options['show_plans'],
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if failures:
+            raise CommandError(f'{failures} endpoint(s) exceeded their query plan budget.')
+        self.stdout.write(self.style.SUCCESS('All query plans are within their budgets.'))
+
+    def check_scenarios(self, scenarios, show_plans=False):
+        checker = QueryPlanChecker()
+        failures = 0
+        next_cursor = get_second_page_cursor()
+
+        for scenario in scenarios:
+            clear_caches()
+            client = get_scenario_client(scenario)
+
+            with CaptureQueriesContext(connection) as context:
+                response = request_scenario(client, scenario, next_cursor)
+
+            if response.status_code >= 400:
+                raise CommandError(f'{scenario.name}: {scenario.url} returned {response.status_code}')
+
+            queries = get_captured_sql(context)
+            if show_plans:
+                for sql in queries:
+                    self.stdout.write(sql)
+                    if sql.lstrip().upper().startswith('SELECT'):
+                        self.stdout.write(json.dumps(explain(sql), indent=2))
+
+            problems = checker.get_problems(scenario, queries)
+            status = self.style.ERROR('FAIL') if problems else self.style.SUCCESS('ok')
+            self.stdout.write(f'{status} {scenario.name}: {len(queries)} queries')
+            for problem in problems:
+                self.stdout.write(f'    {problem}')
+            failures += bool(problems)
+
+        return failures
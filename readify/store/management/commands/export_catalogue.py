@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from store.catalogue import iter_catalogue_rows, render_catalogue_rows
+
+
+class Command(BaseCommand):
+    help = 'Exports the whole catalogue of books as a CSV or JSONL file, streaming it chunk by chunk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'), default='jsonl', dest='file_format',
+            help='Format of the exported file.',
+        )
+        parser.add_argument('--output', help='Path to the exported file, the standard output by default.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of books read at once.')
+
+    def handle(self, *args, **options):
+        rows = iter_catalogue_rows(chunk_size=options['chunk_size'])
+        lines = render_catalogue_rows(rows, options['file_format'])
+
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+            file.writelines(lines)
@@ -0,0 +1,47 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from store.generator import CatalogueGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with a synthetic catalogue of the given size using bulk inserts, '
+        'for example --books 200000 --authors 20000 --publishers 2000 --category-depth 6 --reviews-per-book 10.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000, help='Number of books.')
+        parser.add_argument('--authors', type=int, default=1000, help='Number of authors.')
+        parser.add_argument('--publishers', type=int, default=100, help='Number of publishers.')
+        parser.add_argument('--category-depth', type=int, default=3, help='Number of levels of the category tree.')
+        parser.add_argument(
+            '--category-children', type=int, default=4, help='Number of subcategories of every category.',
+        )
+        parser.add_argument(
+            '--reviews-per-book', type=int, default=5,
+            help='Average number of reviews of a book, the actual number is random between 0 and twice as many.',
+        )
+        parser.add_argument('--users', type=int, default=1000, help='Number of reviewers, at most 10000.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of books inserted at once.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+
+    def handle(self, *args, **options):
+        generator = CatalogueGenerator(
+            books=options['books'],
+            authors=options['authors'],
+            publishers=options['publishers'],
+            category_depth=options['category_depth'],
+            category_children=options['category_children'],
+            reviews_per_book=options['reviews_per_book'],
+            users=options['users'],
+            chunk_size=options['chunk_size'],
+            seed=options['seed'],
+        )
+        started = perf_counter()
+
+        for step, amount in generator.generate():
+            self.stdout.write(f'{perf_counter() - started:8.1f}s  {step}: {amount}')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated the catalogue in {perf_counter() - started:.1f}s'))
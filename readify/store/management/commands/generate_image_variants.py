@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.fields.json import KeyTextTransform
+
+from store.images import IMAGE_FIELDS, update_image_variants
+
+MODELS = {model._meta.model_name: model for model in IMAGE_FIELDS}
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates the missing thumbnails and WebP copies of the images of books, authors and publishers, '
+        'for example for the images uploaded before the variants existed or imported in bulk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', choices=MODELS, action='append', dest='models',
+            help='Process only the images of this model, may be repeated.',
+        )
+        parser.add_argument('--force', action='store_true', help='Regenerate the already generated variants too.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS,
+            help='Number of images processed in parallel.',
+        )
+
+    def handle(self, *args, **options):
+        for name in options['models'] or MODELS:
+            model = MODELS[name]
+            image_field, variants_field = IMAGE_FIELDS[model]
+
+            objects = model.objects.exclude(**{image_field: ''}).exclude(**{f'{image_field}__isnull': True})
+            if not options['force']:
+                # the variants of an image store the name of the image they were generated from
+                objects = objects.annotate(
+                    variants_source=KeyTextTransform('source', variants_field),
+                ).filter(Q(variants_source__isnull=True) | ~Q(variants_source=F(image_field)))
+            pks = list(objects.order_by('pk').values_list('pk', flat=True))
+
+            failed = 0
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                futures = {
+                    executor.submit(self.update, model, pk, options['force']): pk
+                    for pk in pks
+                }
+                for future in as_completed(futures):
+                    error = future.exception()
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(f'{model._meta.verbose_name} {futures[future]}: {error}')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: {len(pks) - failed} processed, {failed} failed'
+            ))
+
+    @staticmethod
+    def update(model, pk, force):
+        try:
+            update_image_variants(model, pk, force=force)
+        finally:
+            connections.close_all()
@@ -0,0 +1,51 @@
+import sys
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalogue import CatalogueImporter, read_catalogue_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports books from a CSV or JSONL catalogue file in chunks. '
+        'Books whose ISBN already exists are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the catalogue file, or "-" to read it from the standard input.')
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'), dest='file_format',
+            help='Format of the file, detected from its extension by default.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of rows imported at once.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError('Unable to detect the format of the file, use --format.')
+
+        importer = CatalogueImporter(chunk_size=options['chunk_size'])
+        file = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        started = perf_counter()
+
+        try:
+            for processed in importer.import_rows(read_catalogue_rows(file, file_format)):
+                elapsed = perf_counter() - started
+                self.stdout.write(
+                    f'Processed {processed} rows, imported {importer.imported}, '
+                    f'{processed / elapsed:.0f} rows/s'
+                )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        for row_number, error in importer.errors:
+            self.stderr.write(f'Row {row_number}: {error}')
+
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.imported} books, skipped {importer.skipped} existing or duplicate, '
+            f'{len(importer.errors)} invalid rows in {elapsed:.1f} s'
+        ))
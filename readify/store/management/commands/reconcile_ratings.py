@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import reconcile_book_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalculates the denormalized rating aggregates of books from their reviews and fixes any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--book', type=int, action='append', dest='book_ids',
+            help='Reconcile only the book with this id (can be repeated).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the number of drifted books without saving them.',
+        )
+
+    def handle(self, *args, **options):
+        drifted = reconcile_book_ratings(options['book_ids'], dry_run=options['dry_run'])
+
+        if options['dry_run']:
+            self.stdout.write(f'Books with drifted ratings: {drifted}')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Reconciled books with drifted ratings: {drifted}'))
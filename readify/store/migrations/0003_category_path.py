@@ -0,0 +1,50 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def get_path(category_id, visited=()):
+        if category_id not in paths:
+            parent_id = parents.get(category_id)
+            if parent_id is None or parent_id in visited:
+                parent_path = ''
+            else:
+                parent_path = get_path(parent_id, visited + (category_id,))
+            paths[category_id] = f'{parent_path}{category_id:010d}/'
+        return paths[category_id]
+
+    categories = list(Category.objects.only('id'))
+    for category in categories:
+        category.path = get_path(category.id)
+        category.depth = category.path.count('/') - 1
+    Category.objects.bulk_update(categories, ('path', 'depth'), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_auto_20230603_1601'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Рівень вкладеності'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=1024, verbose_name='Шлях у дереві категорій'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='store_category_path_idx', opclasses=('varchar_pattern_ops',)),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+FILL_SEARCH_VECTORS_SQL = '''
+    UPDATE store_book SET search_vector =
+        setweight(to_tsvector('simple', coalesce(store_book.title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(store_author.title, ' ')
+            FROM store_author
+            INNER JOIN store_book_author ON store_book_author.author_id = store_author.id
+            WHERE store_book_author.book_id = store_book.id
+        ), '')), 'B')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(store_publisher.title, ' ')
+            FROM store_publisher
+            INNER JOIN store_book_publisher ON store_book_publisher.publisher_id = store_publisher.id
+            WHERE store_book_publisher.book_id = store_book.id
+        ), '')), 'C')
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_category_path'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Пошуковий вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='store_book_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='store_book_title_trgm_idx', opclasses=('gin_trgm_ops',)),
+        ),
+        migrations.RunSQL(FILL_SEARCH_VECTORS_SQL, migrations.RunSQL.noop),
+    ]
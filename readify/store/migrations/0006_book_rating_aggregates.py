@@ -0,0 +1,84 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+FILL_RATING_AGGREGATES_SQL = '''
+    UPDATE store_book SET
+        review_count = ratings.review_count,
+        rating_sum = ratings.rating_sum,
+        rating_1_count = ratings.rating_1_count,
+        rating_2_count = ratings.rating_2_count,
+        rating_3_count = ratings.rating_3_count,
+        rating_4_count = ratings.rating_4_count,
+        rating_5_count = ratings.rating_5_count,
+        average_rating = ratings.rating_sum::double precision / ratings.review_count
+    FROM (
+        SELECT
+            book_id,
+            count(*) AS review_count,
+            sum(rating) AS rating_sum,
+            count(*) FILTER (WHERE rating = 1) AS rating_1_count,
+            count(*) FILTER (WHERE rating = 2) AS rating_2_count,
+            count(*) FILTER (WHERE rating = 3) AS rating_3_count,
+            count(*) FILTER (WHERE rating = 4) AS rating_4_count,
+            count(*) FILTER (WHERE rating = 5) AS rating_5_count
+        FROM store_review
+        GROUP BY book_id
+    ) AS ratings
+    WHERE ratings.book_id = store_book.id
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_book_price_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='average_rating',
+            field=models.FloatField(default=0, editable=False, verbose_name='Середній рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кількість оцінок "Жахливо"'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кількість оцінок "Погано"'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кількість оцінок "Типово"'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кількість оцінок "Чудово"'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кількість оцінок "Ідеально"'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сума оцінок'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кількість рецензій'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['average_rating', 'id'], name='store_book_rating_id_idx'),
+        ),
+        migrations.RunSQL(FILL_RATING_AGGREGATES_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'created', 'id'], name='store_review_book_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_review_book_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Зменшені копії фото'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Зменшені копії обкладинки'),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Зменшені копії фото'),
+        ),
+    ]
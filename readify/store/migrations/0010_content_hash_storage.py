@@ -0,0 +1,29 @@
+# Generated by Django 3.2.18 on 2026-10-18 19:58
+
+from django.db import migrations, models
+import store.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='author',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=store.storage.ContentHashStorage(), upload_to='authors/', verbose_name='Фото'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=models.ImageField(storage=store.storage.ContentHashStorage(), upload_to='book_covers/', verbose_name='Фото обкладинки'),
+        ),
+        migrations.AlterField(
+            model_name='publisher',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=store.storage.ContentHashStorage(), upload_to='publishers/', verbose_name='Фото видавництва'),
+        ),
+    ]
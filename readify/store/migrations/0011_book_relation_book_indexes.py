@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# the through tables of the many-to-many relations of a book are created by Django
+# with a separate index on each foreign key, and the unique (book_id, <relation>_id) index,
+# so the books of an author, a publisher or a language can't be read in the order of their ids
+# without scanning the whole unique index; these indexes serve both the filter and the order
+RELATIONS = ('author', 'publisher', 'language')
+
+
+def create_index_sql(relation):
+    return (
+        f'CREATE INDEX IF NOT EXISTS store_book_{relation}_{relation}_book_idx '
+        f'ON store_book_{relation} ({relation}_id, book_id)'
+    )
+
+
+def drop_index_sql(relation):
+    return f'DROP INDEX IF EXISTS store_book_{relation}_{relation}_book_idx'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_content_hash_storage'),
+    ]
+
+    operations = [
+        migrations.RunSQL(create_index_sql(relation), drop_index_sql(relation))
+        for relation in RELATIONS
+    ]
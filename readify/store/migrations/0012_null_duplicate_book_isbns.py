@@ -0,0 +1,29 @@
+# Generated by Django 3.2.18 on 2026-10-18 21:10
+
+from django.db import migrations
+from django.db.models import Min
+
+
+def null_duplicate_isbns(apps, schema_editor):
+    """
+    The ISBNs become unique, so a blank ISBN is cleared, and so is every copy of a duplicate ISBN
+    except the one of the oldest book. The books themselves, their reviews and relations are kept.
+    """
+    Book = apps.get_model('store', 'Book')
+    Book.objects.filter(isbn='').update(isbn=None)
+
+    first_book_ids = Book.objects.filter(isbn__isnull=False).values('isbn').annotate(
+        first_id=Min('id'),
+    ).values('first_id')
+    Book.objects.filter(isbn__isnull=False).exclude(id__in=first_book_ids).update(isbn=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_book_relation_book_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(null_duplicate_isbns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.18 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_null_duplicate_book_isbns'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(condition=models.Q(('isbn__isnull', False)), fields=('isbn',), name='store_book_isbn_unique'),
+        ),
+    ]
@@ -1,7 +1,13 @@
 from slugify import slugify
 
-from django.db import models
-
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+
+from store.storage import content_hash_storage
 from users.models import User
 
 
@@ -23,18 +29,86 @@ class Category(models.Model):
         max_length=255,
         verbose_name='Заповнюється автоматично'
     )
+    path = models.CharField(
+        max_length=1024,
+        default='',
+        editable=False,
+        verbose_name='Шлях у дереві категорій'
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рівень вкладеності'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата оновлення'
+    )
+
+    # every category in the tree is addressed by a materialized path of zero-padded ids,
+    # e.g. "0000000001/0000000007/", so ordering by path yields parents before their children
+    # and a whole subtree is matched by a single "path LIKE 'prefix%'" predicate
+    PATH_SEGMENT_LENGTH = 10
+    PATH_SEPARATOR = '/'
 
     class Meta:
         verbose_name = 'категорію'
         verbose_name_plural = 'Категорії'
+        indexes = (
+            models.Index(fields=('path',), name='store_category_path_idx', opclasses=('varchar_pattern_ops',)),
+        )
 
     def __str__(self):
         return self.title
 
+    def clean(self):
+        if self.pk is None or self.parent_id is None:
+            return
+
+        parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first()
+        if self.parent_id == self.pk or (self.path and parent_path and parent_path.startswith(self.path)):
+            raise ValidationError({'parent': 'Категорія не може бути вкладена сама в себе або у свою підкатегорію.'})
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
-        return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            result = super().save(*args, **kwargs)
+            self.update_tree_path()
+
+        return result
+
+    def update_tree_path(self):
+        """
+        Recalculates the materialized path of the category from its parent
+        and moves the whole subtree along with it using two UPDATE queries,
+        so the tree index stays correct whenever the parent is changed.
+        """
+        parent_path = ''
+        if self.parent_id is not None:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+
+        new_path = f'{parent_path}{self.pk:0{self.PATH_SEGMENT_LENGTH}d}{self.PATH_SEPARATOR}'
+        if new_path == self.path:
+            return
+
+        old_path, old_depth = self.path, self.depth
+        new_depth = new_path.count(self.PATH_SEPARATOR) - 1
+
+        Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+
+        self.path, self.depth = new_path, new_depth
+
+    def get_ancestor_ids(self):
+        """Returns the ids of all parent categories, from the direct parent up to the root."""
+        segments = self.path.split(self.PATH_SEPARATOR)[:-2]
+        return [int(segment) for segment in reversed(segments)]
 
 
 class Book(models.Model):
@@ -50,8 +124,15 @@ class Book(models.Model):
     )
     cover_image = models.ImageField(
         upload_to='book_covers/',
+        storage=content_hash_storage,
         verbose_name='Фото обкладинки'
     )
+    cover_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Зменшені копії обкладинки'
+    )
     price = models.DecimalField(
         max_digits=6,
         decimal_places=2,
@@ -104,17 +185,96 @@ class Book(models.Model):
         blank=True,
         verbose_name='ISBN'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Пошуковий вектор'
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кількість рецензій'
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Сума оцінок'
+    )
+    rating_1_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кількість оцінок "Жахливо"'
+    )
+    rating_2_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кількість оцінок "Погано"'
+    )
+    rating_3_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кількість оцінок "Типово"'
+    )
+    rating_4_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кількість оцінок "Чудово"'
+    )
+    rating_5_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Кількість оцінок "Ідеально"'
+    )
+    average_rating = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Середній рейтинг'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата оновлення'
+    )
 
     class Meta:
         verbose_name = 'книгу'
         verbose_name_plural = 'Книжки'
+        indexes = (
+            models.Index(fields=('price', 'id'), name='store_book_price_id_idx'),
+            models.Index(fields=('average_rating', 'id'), name='store_book_rating_id_idx'),
+            GinIndex(fields=('search_vector',), name='store_book_search_vector_idx'),
+            GinIndex(fields=('title',), name='store_book_title_trgm_idx', opclasses=('gin_trgm_ops',)),
+        )
+        constraints = (
+            # also the index of the ISBN lookups of the catalogue import
+            models.UniqueConstraint(
+                fields=('isbn',), condition=models.Q(isbn__isnull=False), name='store_book_isbn_unique',
+            ),
+        )
+
+    # maintained by the single-row UPDATEs of store.ratings
+    RATING_FIELDS = (
+        'review_count', 'rating_sum', 'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count',
+        'rating_5_count', 'average_rating',
+    )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
+        """
+        Saving an existing book never writes the rating aggregates, so a book edited
+        while its reviews change can't overwrite them with the values it was loaded with.
+        """
         if not self.slug:
             self.slug = slugify(self.title)
+        if not args and not self._state.adding and not kwargs.get('force_insert') \
+                and kwargs.get('update_fields') is None:
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in deferred_fields
+                and field.name not in self.RATING_FIELDS
+            ]
         return super().save(*args, **kwargs)
 
 
@@ -125,10 +285,17 @@ class Publisher(models.Model):
     )
     image = models.ImageField(
         upload_to='publishers/',
+        storage=content_hash_storage,
         null=True,
         blank=True,
         verbose_name='Фото видавництва'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Зменшені копії фото'
+    )
     description = models.TextField(
         null=True,
         blank=True,
@@ -139,6 +306,10 @@ class Publisher(models.Model):
         unique=True,
         verbose_name='Заповнюється автоматично'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата оновлення'
+    )
 
     class Meta:
         verbose_name = 'видавництво'
@@ -160,10 +331,17 @@ class Author(models.Model):
     )
     image = models.ImageField(
         upload_to='authors/',
+        storage=content_hash_storage,
         null=True,
         blank=True,
         verbose_name='Фото'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Зменшені копії фото'
+    )
     biography = models.TextField(
         null=True,
         blank=True,
@@ -174,6 +352,10 @@ class Author(models.Model):
         unique=True,
         verbose_name='Заповнюється автоматично'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата оновлення'
+    )
 
     class Meta:
         verbose_name = 'автора'
@@ -257,6 +439,9 @@ class Review(models.Model):
     class Meta:
         verbose_name = 'рецензію'
         verbose_name_plural = 'Рецензії'
+        indexes = (
+            models.Index(fields=('book', 'created', 'id'), name='store_review_book_created_idx'),
+        )
 
     def __str__(self):
         return f'{self.user} : {self.book}'
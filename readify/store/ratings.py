@@ -0,0 +1,83 @@
+from django.db.models import Case, Count, F, FloatField, Q, Sum, When
+from django.db.models.functions import Cast, Now
+from django.utils import timezone
+
+from store.cache import bump_version
+from store.models import Book, Review
+
+RATING_VALUES = tuple(value for value, _ in Review.RATING)
+RATING_COUNT_FIELDS = {rating: f'rating_{rating}_count' for rating in RATING_VALUES}
+RATING_FIELDS = Book.RATING_FIELDS
+
+
+def add_review_rating(book_id, rating):
+    """
+    Accounts a new review in the rating aggregates of the book with a single UPDATE query.
+    The right-hand sides of the assignments see the values of the row before the update,
+    so concurrent reviews of the same book never overwrite each other.
+    """
+    count_field = RATING_COUNT_FIELDS[rating]
+    return Book.objects.filter(pk=book_id).update(
+        review_count=F('review_count') + 1,
+        rating_sum=F('rating_sum') + rating,
+        average_rating=Cast(F('rating_sum') + rating, FloatField()) / (F('review_count') + 1),
+        updated_at=Now(),
+        **{count_field: F(count_field) + 1},
+    )
+
+
+def remove_review_rating(book_id, rating):
+    """Removes a deleted review from the rating aggregates of the book with a single UPDATE query."""
+    count_field = RATING_COUNT_FIELDS[rating]
+    return Book.objects.filter(pk=book_id, review_count__gt=0, **{f'{count_field}__gt': 0}).update(
+        review_count=F('review_count') - 1,
+        rating_sum=F('rating_sum') - rating,
+        average_rating=Case(
+            When(review_count__gt=1, then=Cast(F('rating_sum') - rating, FloatField()) / (F('review_count') - 1)),
+            default=0.0,
+            output_field=FloatField(),
+        ),
+        updated_at=Now(),
+        **{count_field: F(count_field) - 1},
+    )
+
+
+def reconcile_book_ratings(book_ids=None, dry_run=False):
+    """
+    Recalculates the rating aggregates of the given books (or of all books) from their reviews
+    with one grouped query, saves the books whose stored values have drifted
+    and invalidates their cached data. Returns the number of drifted books.
+    """
+    reviews = Review.objects.order_by()
+    books = Book.objects.order_by('id')
+    if book_ids is not None:
+        reviews = reviews.filter(book_id__in=book_ids)
+        books = books.filter(id__in=book_ids)
+
+    actual_ratings = {
+        row.pop('book'): row
+        for row in reviews.values('book').annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{field: Count('id', filter=Q(rating=rating)) for rating, field in RATING_COUNT_FIELDS.items()},
+        )
+    }
+    no_ratings = dict.fromkeys(RATING_FIELDS[:-1], 0)
+
+    drifted_books = []
+    for book in books.only('id', *RATING_FIELDS).iterator(chunk_size=2000):
+        actual = dict(actual_ratings.get(book.id, no_ratings))
+        actual['average_rating'] = actual['rating_sum'] / actual['review_count'] if actual['review_count'] else 0.0
+
+        if any(getattr(book, field) != value for field, value in actual.items()):
+            for field, value in actual.items():
+                setattr(book, field, value)
+            book.updated_at = timezone.now()
+            drifted_books.append(book)
+
+    if drifted_books and not dry_run:
+        Book.objects.bulk_update(drifted_books, (*RATING_FIELDS, 'updated_at'), batch_size=1000)
+        # bulk updates send no signals, so the cached ratings of the drifted books are invalidated here
+        bump_version('book', 'rating', *(f'book:{book.id}' for book in drifted_books))
+
+    return len(drifted_books)
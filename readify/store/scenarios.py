@@ -0,0 +1,308 @@
+import re
+from dataclasses import dataclass, field
+from math import ceil
+from urllib.parse import parse_qs, urlsplit
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.urls import NoReverseMatch, resolve, reverse
+
+from store.api.pagination import KeysetPagination
+from store.api.views import CatalogueExportAPIView, book_list_cache, category_tree_cache
+from store.generator import CatalogueGenerator
+from store.models import Author, Book, Category, Language, Publisher
+from users.models import User
+
+# the value of the cursor parameter replaced with the cursor of the second page of the book list
+NEXT_CURSOR = 'next'
+# the staff user of a seeded catalogue, who may export it
+STAFF_EMAIL = 'staff@example.com'
+DISABLED_PLANNER_METHODS = ('enable_seqscan', 'enable_hashjoin', 'enable_mergejoin')
+# the nodes that read all of their input before returning the first row
+BLOCKING_NODE_TYPES = ('Sort', 'Hash', 'Aggregate', 'Materialize', 'SetOp')
+LEADING_COLUMN_SQL = '''
+    SELECT attribute.attname
+    FROM pg_index
+    INNER JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+    INNER JOIN pg_attribute attribute
+        ON attribute.attrelid = pg_index.indrelid AND attribute.attnum = pg_index.indkey[0]
+    WHERE pg_class.relname = %s
+'''
+
+
+@dataclass
+class Scenario:
+    """A request to a store endpoint with the budget of its queries and the tables it may read in full."""
+    name: str
+    url: str
+    params: dict = field(default_factory=dict)
+    max_queries: int = 10
+    full_scans: tuple = ()
+    method: str = 'get'
+    user: object = None
+
+
+def get_endpoint_scenarios(staff=None, reviewer=None):
+    """
+    Returns representative requests to every route of store.api.urls for the data in the database.
+    The requests that need a staff user or a reviewer are left out when they aren't given.
+    """
+    book = Book.objects.filter(review_count__gt=3).order_by('id').first() or Book.objects.order_by('id').first()
+    max_depth = Category.objects.aggregate(max_depth=Max('depth'))['max_depth'] or 0
+    category = Category.objects.filter(depth=max_depth).order_by('id').first()
+    root_category = Category.objects.filter(depth=0).order_by('id').first()
+    author = Author.objects.order_by('id').first()
+    publisher = Publisher.objects.order_by('id').first()
+    language = Language.objects.order_by('id').first()
+    search_word = book.title.split()[0]
+
+    book_list = reverse('book-list')
+    scenarios = [
+        # the whole tree is rendered, reading every category is expected
+        Scenario('category tree', reverse('category-list'), max_queries=1, full_scans=('store_category',)),
+        Scenario('books', book_list, max_queries=2),
+        Scenario('books, second page', book_list, {'cursor': NEXT_CURSOR}, max_queries=2),
+        # counting all the books reads all of them
+        Scenario(
+            'books with the count', book_list, {'count': 'true'},
+            max_queries=3, full_scans=('store_book',),
+        ),
+        Scenario('books by price', book_list, {'ordering': 'price'}, max_queries=2),
+        Scenario(
+            'books by price, deep page', book_list,
+            {'ordering': 'price', 'cursor': get_deep_page_cursor(('price', 'id'))}, max_queries=2,
+        ),
+        Scenario('books by price, descending', book_list, {'ordering': '-price'}, max_queries=2),
+        Scenario('books by rating', book_list, {'ordering': '-average_rating'}, max_queries=2),
+        Scenario(
+            'books by rating, deep page', book_list,
+            {'ordering': '-average_rating', 'cursor': get_deep_page_cursor(('-average_rating', '-id'))},
+            max_queries=2,
+        ),
+        Scenario('books in a price range', book_list, {'min_price': 100, 'max_price': 200}, max_queries=2),
+        Scenario('books with a high rating', book_list, {'min_rating': 4.5}, max_queries=2),
+        Scenario('books of a category', book_list, {'category': category.id}, max_queries=3),
+        # the subtrees of all the categories are collected at once and cached until a category changes
+        Scenario(
+            'books of a category subtree', book_list, {'category_tree': root_category.id},
+            max_queries=3, full_scans=('store_category',),
+        ),
+        Scenario(
+            'books of a category by price', book_list,
+            {'category': category.id, 'ordering': 'price'}, max_queries=3,
+        ),
+        Scenario('books of an author', book_list, {'author': author.id}, max_queries=3),
+        Scenario('books of a publisher', book_list, {'publisher': publisher.id}, max_queries=3),
+        Scenario('books in a language', book_list, {'language': language.id}, max_queries=3),
+        Scenario('search', book_list, {'search': search_word}, max_queries=3),
+        # nothing matches the misspelled word, the first page is fetched again by the trigram index of the title
+        Scenario('search with a typo', book_list, {'search': search_word + search_word[-1]}, max_queries=4),
+        Scenario(
+            'books of a category with facets', book_list,
+            {'category': category.id, 'facets': 'true'}, max_queries=5,
+        ),
+        # languages and papers are dictionaries of a few rows
+        Scenario(
+            'book', reverse('book-detail', args=(book.id,)),
+            max_queries=8, full_scans=('store_language', 'store_paper'),
+        ),
+        Scenario('book reviews', reverse('book-reviews', args=(book.id,)), max_queries=2),
+        Scenario('publisher', reverse('publisher-detail', args=(publisher.id,)), max_queries=5),
+        Scenario('publisher books', reverse('publisher-books', args=(publisher.id,)), max_queries=3),
+        Scenario('author', reverse('author-detail', args=(author.id,)), max_queries=5),
+        Scenario('author books', reverse('author-books', args=(author.id,)), max_queries=3),
+    ]
+
+    if reviewer is not None:
+        scenarios.append(Scenario(
+            'review creation', reverse('review-create'),
+            {'book': book.id, 'user': str(reviewer.id), 'title': 'Test', 'content': 'Test', 'rating': 5},
+            max_queries=6, method='post', user=reviewer,
+        ))
+    if staff is not None:
+        # the export reads the whole catalogue by definition, the relations of a chunk of books
+        # are read from the through tables in the primary key order
+        scenarios.append(Scenario(
+            'catalogue export', reverse('catalogue-export'), {'type': 'csv'},
+            max_queries=2 + 4 * ceil(Book.objects.count() / CatalogueExportAPIView.chunk_size), user=staff,
+            full_scans=('store_book_author', 'store_book_publisher', 'store_book_paper', 'store_book_language'),
+        ))
+
+    return scenarios
+
+
+def seed_catalogue(books):
+    """
+    Generates a synthetic catalogue of the given number of books with a staff user
+    and analyzes the tables, so the planner sees the generated data. Yields the generated steps.
+    """
+    generator = CatalogueGenerator(
+        books=books, authors=max(books // 10, 10), publishers=max(books // 100, 5),
+        category_depth=4, category_children=4, reviews_per_book=3, users=200,
+    )
+    yield from generator.generate()
+
+    User.objects.create_user(email=STAFF_EMAIL, phone_number='0999999999', password=None, is_staff=True, is_active=True)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def get_scenario_users():
+    """Returns the staff user and a reviewer of a seeded catalogue."""
+    staff = User.objects.get(email=STAFF_EMAIL)
+    reviewer = User.objects.filter(is_staff=False).order_by('email').first()
+    return staff, reviewer
+
+
+def get_async_url(url):
+    """Returns the URL of the asynchronous version of a store endpoint, or None if it has none."""
+    match = resolve(url)
+    try:
+        return reverse(f'async-{match.url_name}', kwargs=match.kwargs)
+    except NoReverseMatch:
+        return None
+
+
+def get_deep_page_cursor(ordering):
+    """
+    Returns the cursor of the page of the book list in the middle of the ordering,
+    made from the book at that position instead of paging to it.
+    """
+    fields = [field.lstrip('-') for field in ordering]
+    row = Book.objects.order_by(*ordering).values(*fields)[Book.objects.count() // 2:].first()
+    if row is None:
+        return None
+
+    pagination = KeysetPagination()
+    pagination.current_ordering = ordering
+    return pagination.make_cursor(ordering, pagination.get_position(row))
+
+
+def get_second_page_cursor():
+    response = Client().get(reverse('book-list'))
+    next_link = response.json()['next']
+    return parse_qs(urlsplit(next_link).query)['cursor'][0] if next_link else None
+
+
+def clear_caches():
+    """Clears the rendered responses, so the next request is served from the database."""
+    book_list_cache.clear()
+    category_tree_cache.clear()
+    cache.clear()
+
+
+def get_scenario_client(scenario):
+    client = Client()
+    if scenario.user is not None:
+        client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(scenario.user)}'
+    return client
+
+
+def get_scenario_params(scenario, next_cursor=None):
+    params = dict(scenario.params)
+    if params.get('cursor') == NEXT_CURSOR:
+        params['cursor'] = next_cursor
+    return params
+
+
+def request_scenario(client, scenario, next_cursor=None):
+    """Sends the request of the scenario and reads the whole response, streamed or not."""
+    response = getattr(client, scenario.method)(scenario.url, get_scenario_params(scenario, next_cursor))
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def get_captured_sql(context):
+    """
+    Returns the SQL of the queries captured by a CaptureQueriesContext without the savepoint statements,
+    which atomic blocks only make inside the transaction of a test.
+    """
+    return [
+        query['sql'] for query in context.captured_queries
+        if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+    ]
+
+
+def explain(sql):
+    """
+    Returns the plan of the query with sequential scans, hash joins and merge joins disabled,
+    so every table is expected to be reached through an index as it would be at production scale.
+    The settings are rolled back with the savepoint, also inside the transaction of a test.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for setting in DISABLED_PLANNER_METHODS:
+            cursor.execute(f'SET LOCAL {setting} = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0][0]['Plan']
+        transaction.set_rollback(True)
+    return plan
+
+
+class QueryPlanChecker:
+    """
+    This class checks the queries of a scenario against its budget and explains every SELECT,
+    see explain(), to find the tables that are still read in full.
+    """
+
+    def __init__(self):
+        self.leading_columns = {}
+
+    def get_problems(self, scenario, queries):
+        """Returns the descriptions of the problems of the queries made by the request of the scenario."""
+        problems = []
+        if len(queries) > scenario.max_queries:
+            problems.append(f'{len(queries)} queries, the budget is {scenario.max_queries}')
+
+        for sql in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            full_scans = sorted({
+                relation for relation in self.get_full_scans(explain(sql)) if relation not in scenario.full_scans
+            })
+            if full_scans:
+                problems.append(f'full scan of {", ".join(full_scans)} in: {sql[:300]}')
+
+        return problems
+
+    def get_leading_column(self, index_name):
+        if index_name not in self.leading_columns:
+            with connection.cursor() as cursor:
+                cursor.execute(LEADING_COLUMN_SQL, [index_name])
+                row = cursor.fetchone()
+            self.leading_columns[index_name] = row[0] if row else None
+        return self.leading_columns[index_name]
+
+    def get_full_scans(self, node, limited=False):
+        """
+        Yields the tables the plan reads in full: sequential scans that remain even though they are disabled,
+        index scans whose condition doesn't use the leading column of the index,
+        and index scans without any condition, unless they are ordered scans stopped by a LIMIT.
+        """
+        node_type = node['Node Type']
+        if node_type == 'Seq Scan':
+            yield node['Relation Name']
+        elif node_type in ('Index Scan', 'Index Only Scan'):
+            condition = node.get('Index Cond')
+            if condition is None:
+                if not limited:
+                    yield node['Relation Name']
+            else:
+                leading_column = self.get_leading_column(node['Index Name'])
+                if leading_column is None or not re.search(rf'\b{leading_column}\b', condition):
+                    yield node['Relation Name']
+
+        limited = node_type == 'Limit' or (limited and node_type not in BLOCKING_NODE_TYPES)
+        for child in node.get('Plans', ()):
+            yield from self.get_full_scans(child, limited)
+
+
+def percentile(values, percent):
+    """Returns the nearest-rank percentile of the values."""
+    values = sorted(values)
+    index = max(int(round(percent / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
@@ -0,0 +1,40 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db.models import OuterRef, Subquery
+
+from store.models import Book, Author, Publisher
+
+# PostgreSQL has no built-in dictionary for Ukrainian,
+# so words are only lowercased and indexed as they are, without stemming
+SEARCH_CONFIG = 'simple'
+
+
+def get_book_search_vector():
+    """
+    Builds the expression of the book search vector:
+    the title has the highest weight, then the names of the authors and the publishers.
+    """
+    author_names = Author.objects.filter(books=OuterRef('pk')).values('books').annotate(
+        names=StringAgg('title', delimiter=' ')
+    ).values('names')
+    publisher_names = Publisher.objects.filter(books=OuterRef('pk')).values('books').annotate(
+        names=StringAgg('title', delimiter=' ')
+    ).values('names')
+
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(author_names), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(publisher_names), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_book_search_vectors(book_ids=None):
+    """
+    Recalculates the search vector of the given books (or of all books) with a single UPDATE query.
+    book_ids may be any iterable of ids or a values('id') queryset.
+    """
+    books = Book.objects.all()
+    if book_ids is not None:
+        books = books.filter(id__in=book_ids)
+
+    return books.update(search_vector=get_book_search_vector())
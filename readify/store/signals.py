@@ -0,0 +1,223 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from store.cache import bump_version
+from store.images import schedule_image_variants
+from store.models import Category, Book, Author, Publisher, Paper, Language, Review
+from store.ratings import add_review_rating, remove_review_rating, reconcile_book_ratings
+from store.search import update_book_search_vectors
+from store.utils import get_category_tree_tags
+from users.models import User
+
+# every change of these models bumps the version of its namespace,
+# which invalidates cached data and HTTP validators that depend on it
+VERSIONED_MODELS = {
+    Category: 'category',
+    Book: 'book',
+    Author: 'author',
+    Publisher: 'publisher',
+    Paper: 'paper',
+    Language: 'language',
+    Review: 'review',
+}
+
+
+def get_book_tags(book_ids):
+    """
+    Returns the tags of the cached book lists that may contain the given books:
+    the tags of the books themselves and of their categories, authors, publishers and languages,
+    and the tags of the subtrees of all the ancestors of their categories.
+    """
+    book_ids = list(book_ids)
+    tags = {'book:*', *(f'book:{book_id}' for book_id in book_ids)}
+
+    categories = Book.objects.filter(id__in=book_ids, category__isnull=False).values_list(
+        'category_id', 'category__path',
+    )
+    for category_id, path in categories:
+        tags.add(f'category:{category_id}')
+        tags.update(get_category_tree_tags((path,)))
+
+    for relation in ('author', 'publisher', 'language'):
+        related_ids = getattr(Book, relation).through.objects.filter(
+            book_id__in=book_ids
+        ).values_list(f'{relation}_id', flat=True)
+        tags.update(f'{relation}:{related_id}' for related_id in related_ids)
+
+    return tags
+
+
+@receiver(post_delete, sender=Category)
+def rebuild_orphaned_subcategories(sender, instance, **kwargs):
+    """
+    Deleting a category sets the parent of its subcategories to NULL directly in the database,
+    bypassing Category.save(), so the former subcategories are re-rooted here
+    together with the paths of their own subtrees.
+    """
+    if not instance.path:
+        return
+
+    orphans = Category.objects.filter(
+        parent=None,
+        depth=instance.depth + 1,
+        path__startswith=instance.path,
+    )
+    for category in orphans:
+        category.update_tree_path()
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version(sender, **kwargs):
+    """
+    The version is bumped once the transaction of the change commits, see bump_version(),
+    so a request served in the meantime never derives the new validators from the old rows.
+    """
+    namespace = VERSIONED_MODELS.get(sender)
+    if namespace is not None:
+        bump_version(namespace)
+
+
+@receiver(post_save, sender=User)
+def bump_reviews_version_on_user_rename(sender, update_fields=None, **kwargs):
+    # reviews are rendered with the names of their authors
+    if update_fields is None or {'first_name', 'last_name'} & set(update_fields):
+        bump_version('review')
+
+
+@receiver(post_save, sender=Book)
+def update_book_search_vector(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_book_search_vectors((instance.pk,))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    """Generates the thumbnails and WebP copies of a new or replaced image in the background."""
+    if raw:
+        return
+    schedule_image_variants(instance)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Publisher)
+def update_related_books_search_vectors(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        update_book_search_vectors(instance.books.values('id'))
+
+
+@receiver(m2m_changed, sender=Book.author.through)
+@receiver(m2m_changed, sender=Book.publisher.through)
+@receiver(m2m_changed, sender=Book.paper.through)
+@receiver(m2m_changed, sender=Book.language.through)
+def update_books_on_m2m_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Changes of the many-to-many relations of a book don't save the book itself,
+    so the search vectors and the modification time of the affected books are updated here
+    and the cached book lists that contain them or are filtered by the changed relation are invalidated.
+    """
+    relation = (instance if reverse else model)._meta.model_name
+
+    if action == 'pre_clear':
+        # the cleared objects are unknown after clear(), so they are remembered beforehand
+        if reverse:
+            instance._cleared_ids = set(sender.objects.filter(**{relation: instance}).values_list('book_id', flat=True))
+        else:
+            instance._cleared_ids = set(sender.objects.filter(book=instance).values_list(f'{relation}_id', flat=True))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    changed_ids = instance.__dict__.pop('_cleared_ids', set()) if action == 'post_clear' else pk_set
+    book_ids, related_ids = (changed_ids, (instance.pk,)) if reverse else ((instance.pk,), changed_ids)
+    if not book_ids or not related_ids:
+        return
+
+    if sender in (Book.author.through, Book.publisher.through):
+        update_book_search_vectors(book_ids)
+    Book.objects.filter(id__in=book_ids).update(updated_at=timezone.now())
+
+    bump_version(
+        'book',
+        *get_book_tags(book_ids),
+        *(f'{relation}:{related_id}' for related_id in related_ids),
+    )
+
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_delete, sender=Book)
+def remember_book_tags(sender, instance, raw=False, **kwargs):
+    # the category and the relations of the book before the change
+    instance._book_tags = get_book_tags((instance.pk,)) if instance.pk and not raw else set()
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_lists_on_book_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    category_path = None
+    if instance.category_id is not None:
+        category_path = Category.objects.filter(pk=instance.category_id).values_list('path', flat=True).first()
+    bump_version(
+        'book:*', f'book:{instance.pk}', f'category:{instance.category_id}',
+        *get_category_tree_tags((category_path,)),
+        *instance.__dict__.pop('_book_tags', ()),
+    )
+
+
+@receiver(post_save, sender=Author)
+@receiver(pre_delete, sender=Author)
+@receiver(post_save, sender=Publisher)
+@receiver(pre_delete, sender=Publisher)
+@receiver(pre_delete, sender=Language)
+def invalidate_book_lists_on_relation_change(sender, instance, raw=False, **kwargs):
+    # renamed authors are shown in the lists, and all of them are matched by the search
+    if raw:
+        return
+
+    book_ids = instance.book_set.values_list('id', flat=True) if sender is Language \
+        else instance.books.values_list('id', flat=True)
+    bump_version('search', f'{sender._meta.model_name}:{instance.pk}', *(f'book:{book_id}' for book_id in book_ids))
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_book_lists_on_category_delete(sender, instance, **kwargs):
+    bump_version(f'category:{instance.pk}')
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_book_lists_on_rating_change(sender, raw=False, **kwargs):
+    if not raw:
+        bump_version('rating')
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_book(sender, instance, raw=False, **kwargs):
+    # an edited review may be moved to another book, whose aggregates lose its rating
+    instance._previous_book_id = Review.objects.filter(pk=instance.pk).values_list('book_id', flat=True).first() \
+        if instance.pk and not raw else None
+
+
+@receiver(post_save, sender=Review)
+def update_book_rating_on_review_save(sender, instance, created, raw=False, **kwargs):
+    previous_book_id = instance.__dict__.pop('_previous_book_id', None)
+    if raw:
+        return
+
+    if created:
+        add_review_rating(instance.book_id, instance.rating)
+    else:
+        # the previous rating of an edited review is unknown, so the aggregates are recalculated
+        reconcile_book_ratings({instance.book_id, previous_book_id} - {None})
+
+
+@receiver(post_delete, sender=Review)
+def update_book_rating_on_review_delete(sender, instance, **kwargs):
+    remove_review_rating(instance.book_id, instance.rating)
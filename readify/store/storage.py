@@ -0,0 +1,51 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CONTENT_HASH_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{64}(?:\.[0-9a-z]+)?$')
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """
+    This storage names every saved file by the SHA-256 hash of its content
+    as <upload directory>/<first 2 hex digits>/<hash>.<extension>, ignoring the uploaded name.
+    The same content always gets the same name, so uploading an identical file again
+    reuses the stored one instead of creating a duplicate,
+    and a stored file never changes, so it can be cached by clients forever.
+    """
+    hash_chunk_size = 64 * 1024
+
+    @staticmethod
+    def is_content_addressed(name):
+        return bool(CONTENT_HASH_NAME_RE.search(name))
+
+    def get_content_hash(self, content):
+        content_hash = hashlib.sha256()
+
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(chunk_size=self.hash_chunk_size):
+            content_hash.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+
+        return content_hash.hexdigest()
+
+    def get_content_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        content_hash = self.get_content_hash(content)
+        return posixpath.join(directory, content_hash[:2], f'{content_hash}{extension}')
+
+    def _save(self, name, content):
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+content_hash_storage = ContentHashStorage()
@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store.api.views import book_list_cache
+from store.catalogue import CatalogueImporter
+from store.models import Book, Category
+from store.scenarios import (
+    QueryPlanChecker,
+    clear_caches,
+    get_captured_sql,
+    get_endpoint_scenarios,
+    get_scenario_client,
+    get_scenario_users,
+    get_second_page_cursor,
+    request_scenario,
+    seed_catalogue,
+)
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'query-plans'}}
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['testserver'])
+class QueryPlanTests(TestCase):
+    """
+    Requests every store endpoint on a synthetic catalogue and checks that it stays within its query budget
+    and that none of its queries reads a whole table, see store.scenarios.QueryPlanChecker.
+    The check_query_plans command runs the same checks on a catalogue of a chosen size.
+    """
+    books = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        list(seed_catalogue(cls.books))
+        cls.staff, cls.reviewer = get_scenario_users()
+
+    def setUp(self):
+        clear_caches()
+
+    def test_endpoint_scenarios(self):
+        checker = QueryPlanChecker()
+        next_cursor = get_second_page_cursor()
+
+        for scenario in get_endpoint_scenarios(staff=self.staff, reviewer=self.reviewer):
+            with self.subTest(scenario.name):
+                clear_caches()
+                with CaptureQueriesContext(connection) as context:
+                    response = request_scenario(get_scenario_client(scenario), scenario, next_cursor)
+
+                self.assertLess(response.status_code, 400, scenario.url)
+                queries = get_captured_sql(context)
+                self.assertLessEqual(len(queries), scenario.max_queries)
+                self.assertEqual(checker.get_problems(scenario, queries), [])
+
+    def test_import_into_subcategory_invalidates_subtree_book_list(self):
+        category = Category.objects.filter(depth__gt=0).order_by('id').first()
+        root_id = int(category.path.split(Category.PATH_SEPARATOR)[0])
+        client = Client()
+        params = {'category_tree': root_id}
+
+        # the first request stamps the versions of the list's tags after it started rendering,
+        # so the list isn't cached until the second one
+        for _ in range(2):
+            client.get(reverse('book-list'), params)
+        self.assertEqual(book_list_cache.stats()['entries'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CatalogueImporter().import_chunk([{
+                'title': 'Імпортована книга', 'isbn': 'query-plans-import', 'price': '100', 'category': category.title,
+            }])
+        book_id = Book.objects.get(isbn='query-plans-import').id
+
+        results = client.get(reverse('book-list'), params).json()['results']
+        self.assertIn(book_id, [result['id'] for result in results])
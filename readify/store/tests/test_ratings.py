@@ -0,0 +1,44 @@
+from django.test import TestCase
+
+from store.models import Book, Review
+from users.models import User
+
+
+class BookRatingTests(TestCase):
+    """Checks that the rating aggregates of the books follow their reviews."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='reviewer@example.com', phone_number='0501234567')
+        cls.book = Book.objects.create(title='Кобзар', price=100)
+        cls.other_book = Book.objects.create(title='Енеїда', price=100)
+
+    def create_review(self, book, rating):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Review.objects.create(book=book, user=self.user, title='Рецензія', content='Вміст', rating=rating)
+
+    def test_saving_a_stale_book_keeps_its_ratings(self):
+        stale_book = Book.objects.get(pk=self.book.pk)
+        self.create_review(self.book, 5)
+
+        stale_book.title = 'Кобзар. Повне видання'
+        stale_book.save()
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, 'Кобзар. Повне видання')
+        self.assertEqual((self.book.review_count, self.book.rating_sum, self.book.rating_5_count), (1, 5, 1))
+        self.assertEqual(self.book.average_rating, 5.0)
+
+    def test_moving_a_review_to_another_book_updates_both_books(self):
+        review = self.create_review(self.book, 4)
+
+        review.book = self.other_book
+        with self.captureOnCommitCallbacks(execute=True):
+            review.save()
+
+        self.book.refresh_from_db()
+        self.other_book.refresh_from_db()
+        self.assertEqual((self.book.review_count, self.book.rating_sum, self.book.rating_4_count), (0, 0, 0))
+        self.assertEqual(self.book.average_rating, 0.0)
+        self.assertEqual((self.other_book.review_count, self.other_book.rating_4_count), (1, 1))
+        self.assertEqual(self.other_book.average_rating, 4.0)
@@ -1,17 +1,78 @@
+from store.cache import VersionedCache
 from store.models import Category
 
+category_subtree_cache = VersionedCache('category')
 
-def get_parent_categories_from_child_to_parent(obj, serializer):
-    categories = []
 
-    while obj.parent is not None:
-        try:
-            obj = obj.parent
-            categories.append(obj)
-        except AttributeError:
-            continue
+def get_category_ancestors(category):
+    """
+    Returns the parent categories of the given category, from the direct parent up to the root.
+    The ancestor ids are taken from the materialized path of the category,
+    so the whole lineage of any depth is loaded with at most one query.
+    """
+    ancestor_ids = category.get_ancestor_ids()
+    if not ancestor_ids:
+        return []
+
+    categories = Category.objects.filter(id__in=ancestor_ids).only('id', 'title', 'slug', 'parent', 'path')
+    categories_by_id = {category.id: category for category in categories}
+    return [categories_by_id[ancestor_id] for ancestor_id in ancestor_ids if ancestor_id in categories_by_id]
 
-    Category.objects.select_related('parent').filter(id__in=[category.id for category in categories])
 
+def get_parent_categories_from_child_to_parent(obj, serializer):
+    categories = get_category_ancestors(obj)
     serializer_data = serializer(categories, many=True).data
     return serializer_data
+
+
+def build_category_tree(categories):
+    """
+    Assembles a flat iterable of categories ordered by their materialized path
+    into a tree in memory. Every category gets a "children" list attribute
+    and the list of root categories is returned, so a tree of any depth
+    is built from the result of a single query.
+    """
+    roots = []
+    categories_by_id = {}
+
+    for category in categories:
+        category.children = []
+        categories_by_id[category.id] = category
+
+        parent = categories_by_id.get(category.parent_id)
+        if parent is None:
+            roots.append(category)
+        else:
+            parent.children.append(category)
+
+    return roots
+
+
+def build_category_subtrees():
+    """
+    Returns the ids of every category together with all of its descendants by the id of the category.
+    Every segment of a materialized path is the id of an ancestor, or of the category itself,
+    so the subtrees of the whole tree of any depth are collected from a single query.
+    """
+    subtrees = {}
+    for category_id, path in Category.objects.values_list('id', 'path'):
+        for segment in path.split(Category.PATH_SEPARATOR)[:-1]:
+            subtrees.setdefault(int(segment), []).append(category_id)
+    return subtrees
+
+
+def get_category_subtree_ids(category_id):
+    """
+    Returns the ids of the category and all of its descendants, or an empty list for an unknown category.
+    The subtrees are kept in the versioned category cache and are collected again only after a category changes.
+    """
+    return category_subtree_cache.get_or_set('subtrees', build_category_subtrees).get(category_id, [])
+
+
+def get_category_tree_tags(paths):
+    """Returns the tags of the book lists filtered by the subtrees the categories with the given paths belong to."""
+    return {
+        f'category-tree:{int(segment)}'
+        for path in paths if path
+        for segment in path.split(Category.PATH_SEPARATOR)[:-1]
+    }
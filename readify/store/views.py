@@ -0,0 +1,117 @@
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from store.storage import ContentHashStorage
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+def get_byte_range(request, size, etag, last_modified):
+    """
+    Returns the (start, end) byte range requested with the Range header,
+    None when the whole file should be sent, or False when the range can't be satisfied.
+    Multiple ranges are not supported and are answered with the whole file,
+    as well as a range whose If-Range validator doesn't match the file anymore.
+    """
+    match = RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+    if match is None:
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(last_modified):
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # a suffix range, the last N bytes of the file
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iterate_file_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path, document_root=None):
+    """
+    This view serves uploaded media files with validators and support of conditional and range requests.
+    Files stored under their content hash by ContentHashStorage never change,
+    so they are served with a far-future immutable Cache-Control,
+    while the files uploaded under their original names have to be revalidated on every use.
+    It is routed only with SERVE_MEDIA, in production the web server sends the same headers.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    fullpath = Path(safe_join(document_root, path))
+    if not fullpath.is_file():
+        raise Http404('Файл не знайдено')
+
+    stat = fullpath.stat()
+    content_addressed = ContentHashStorage.is_content_addressed(path)
+    if content_addressed:
+        etag = quote_etag(posixpath.splitext(posixpath.basename(path))[0])
+    else:
+        etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = stat.st_mtime
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(str(fullpath))
+        content_type = content_type or 'application/octet-stream'
+        byte_range = get_byte_range(request, stat.st_size, etag, last_modified)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range is None:
+            response = FileResponse(fullpath.open('rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                iterate_file_range(fullpath.open('rb'), start, length),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(length)
+
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if content_addressed:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+
+    return response
@@ -2,6 +2,7 @@ import re
 
 from djoser.conf import settings
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions as django_exceptions
@@ -63,3 +64,11 @@ class UserCreateSerializer(serializers.ModelSerializer):
                 user.save(update_fields=['is_active'])
 
         return user
+
+
+class TokenWithEmailObtainPairSerializer(TokenObtainPairSerializer):
+    """The user is authenticated and the tokens are issued once, only the access token is returned."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        return {'email': self.user.email, 'token': data['access']}
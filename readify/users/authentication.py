@@ -0,0 +1,117 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+from users.models import User
+
+SHARED_KEY_PREFIX = 'users:user:'
+
+
+class UserCache:
+    """
+    Cache of the users loaded by their primary key for authentication.
+
+    Users are kept in the memory of the current process for USER_CACHE_TIMEOUT seconds
+    in an LRU of at most max_entries users, and with USER_CACHE_SHARED also in the shared cache,
+    so the other processes don't have to query the database either.
+    A saved or deleted user is removed from the shared cache and from the current process,
+    the other processes see the change once their copy expires, at most after USER_CACHE_TIMEOUT.
+    Changes that bypass User.save() have to call invalidate_many() with the changed users,
+    User.objects.filter(...).update(...) does it through the users_updated signal.
+    Every caller gets its own copy of the cached user, so changing it never affects other requests.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(pk):
+        return f'{SHARED_KEY_PREFIX}{pk}'
+
+    def get(self, pk):
+        """Returns the user with the primary key from the cache or the database, or None if it doesn't exist."""
+        pk = str(pk)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(pk)
+                return copy.copy(entry[1])
+
+        user = cache.get(self._shared_key(pk)) if settings.USER_CACHE_SHARED else None
+        if user is None:
+            user = User.objects.filter(pk=pk).first()
+            if user is None:
+                return None
+            if settings.USER_CACHE_SHARED:
+                cache.set(self._shared_key(pk), user, timeout=settings.USER_CACHE_TIMEOUT)
+
+        with self._lock:
+            self._entries[pk] = (now + settings.USER_CACHE_TIMEOUT, user)
+            self._entries.move_to_end(pk)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return copy.copy(user)
+
+    def invalidate(self, pk):
+        """Removes the user now and once more after the current transaction is committed."""
+        self.invalidate_many((pk,))
+
+    def invalidate_many(self, pks):
+        """Removes the users now and once more after the current transaction is committed."""
+        pks = [str(pk) for pk in pks]
+
+        def remove():
+            with self._lock:
+                for pk in pks:
+                    self._entries.pop(pk, None)
+            if settings.USER_CACHE_SHARED:
+                cache.delete_many([self._shared_key(pk) for pk in pks])
+
+        # a request made before the commit could have cached the old state again
+        remove()
+        transaction.on_commit(remove)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    This authentication class resolves the user of an access token through the user cache
+    instead of querying the database on every request.
+    Deactivated and deleted users are rejected as soon as their cached copy is invalidated.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return user
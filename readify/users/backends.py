@@ -1,46 +1,30 @@
 from django.contrib.auth.backends import BaseBackend
+from django.db.models import Q
 
+from .authentication import user_cache
 from .models import User
 
 
-class EmailBackend(BaseBackend):
-    def authenticate(self, request, **kwargs):
-
-        email = kwargs.get('email')
-        password = kwargs.get('password')
-
-        if email is None:
-            email = kwargs.get('username')
-
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return None
-
-        if user.check_password(password):
-            return user
+class EmailOrPhoneBackend(BaseBackend):
+    """
+    This backend authenticates a user by the email or the phone number passed as the username field,
+    both are looked up with one query on their unique indexes and the password is checked once.
+    """
 
-        return None
-
-    def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
-
-
-class PhoneBackend(BaseBackend):
     def authenticate(self, request, **kwargs):
 
-        phone_number = kwargs.get('email')
+        login = kwargs.get(User.USERNAME_FIELD)
         password = kwargs.get('password')
 
-        if phone_number is None:
-            phone_number = kwargs.get('username')
+        if login is None:
+            login = kwargs.get('username')
+        if login is None or password is None:
+            return None
 
-        try:
-            user = User.objects.get(phone_number=phone_number)
-        except User.DoesNotExist:
+        user = User.objects.filter(Q(email=login) | Q(phone_number=login)).first()
+        if user is None:
+            # hashing the password anyway keeps the response time the same for unknown users
+            User().set_password(password)
             return None
 
         if user.check_password(password):
@@ -49,7 +33,4 @@ class PhoneBackend(BaseBackend):
         return None
 
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        return user_cache.get(user_id)
@@ -0,0 +1,63 @@
+import logging
+from statistics import mean
+from time import perf_counter
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the throughput of the token login with an email, a phone number and a wrong password '
+        'for a temporary user that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Number of measured logins of every kind.')
+
+    def handle(self, *args, **options):
+        suffix = uuid4().hex[:8]
+        password = uuid4().hex
+        client = Client()
+        url = reverse('token_obtain_pair')
+        # every failed login is logged as a warning
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            user = User.objects.create_user(
+                email=f'benchmark-{suffix}@example.com',
+                phone_number=f'0{int(suffix, 16) % 10 ** 9:09d}',
+                password=password,
+                is_active=True,
+            )
+
+            for name, login, login_password, expected_status in (
+                ('email', user.email, password, 200),
+                ('phone number', user.phone_number, password, 200),
+                ('wrong password', user.email, f'{password}-wrong', 401),
+            ):
+                data = {User.USERNAME_FIELD: login, 'password': login_password}
+                client.post(url, data)
+
+                timings = []
+                with CaptureQueriesContext(connection) as context:
+                    for _ in range(options['requests']):
+                        started = perf_counter()
+                        response = client.post(url, data)
+                        timings.append((perf_counter() - started) * 1000)
+                        if response.status_code != expected_status:
+                            raise CommandError(f'Login with {name} returned {response.status_code}.')
+
+                self.stdout.write(
+                    f'{name:15} mean {mean(timings):7.1f} ms, best {min(timings):7.1f} ms, '
+                    f'{1000 / mean(timings):6.1f} logins/s, '
+                    f'{len(context.captured_queries) / options["requests"]:.1f} queries per login'
+                )
+
+            transaction.set_rollback(True)
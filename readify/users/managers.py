@@ -1,7 +1,25 @@
 from django.contrib.auth.models import BaseUserManager
+from django.db.models import QuerySet
+from django.dispatch import Signal
 
+# sent with the primary keys of the users changed by UserQuerySet.update(), which sends no post_save
+users_updated = Signal()
 
-class UserManager(BaseUserManager):
+
+class UserQuerySet(QuerySet):
+    def update(self, **kwargs):
+        """
+        Bulk updates, and so bulk_update(), bypass User.save(), so the primary keys of the updated users
+        are sent with users_updated, which invalidates their cached copies, see users.authentication.UserCache.
+        """
+        pks = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        if pks:
+            users_updated.send(sender=self.model, pks=pks)
+        return rows
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, phone_number, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import user_cache
+from users.managers import users_updated
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """A saved, deactivated or deleted user must not be authenticated from a stale cached copy."""
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(users_updated, sender=User)
+def invalidate_cached_users(sender, pks, **kwargs):
+    user_cache.invalidate_many(pks)
@@ -0,0 +1,33 @@
+from django.test import TestCase
+
+from users.authentication import user_cache
+from users.models import User
+
+
+class UserCacheTests(TestCase):
+    """Checks that the cached users used for authentication follow the changes of the users."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='reader@example.com', phone_number='0501234567', is_active=True)
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+
+    def test_saved_user_is_invalidated(self):
+        self.assertTrue(user_cache.get(self.user.pk).is_active)
+
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+
+        self.assertFalse(user_cache.get(self.user.pk).is_active)
+
+    def test_bulk_updated_users_are_invalidated(self):
+        self.assertTrue(user_cache.get(self.user.pk).is_active)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = User.objects.filter(email=self.user.email).update(is_active=False)
+
+        self.assertEqual(updated, 1)
+        self.assertFalse(user_cache.get(self.user.pk).is_active)